@@ -3,10 +3,13 @@ import sys
 import os
 import importlib
 import time
+import argparse
+import json
 from typing import List, Dict, Any
-from evaluation_helper import evaluate_results
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/backend')))
+from evaluation_helper import evaluate_results, sweep_thresholds
+from prediction_store import PredictionStore, memoized_anonymize, print_stats, DEFAULT_STORE_PATH
 from anonymizers.spacy_anonymizer import SpacyAnonymizer  # Explicit import of SpacyAnonymizer
 
 def load_pipeline_from_yaml(file_path):
@@ -49,13 +52,31 @@ def save_evaluation_metrics(metrics, output_dir, pipeline_step, execution_time=N
             file.write("\nExecution Time:\n")
             file.write(f"Step Execution Time: {execution_time:.2f} seconds\n")
 
-def execute_pipeline(config_file_path, output_dir):
-    """Execute the pipeline steps as defined in the configuration file."""
+def save_pr_curves(curves, output_dir, pipeline_step):
+    """Save per-entity PR curves as JSON and print the best operating point of each entity."""
+    curves_file = os.path.join(output_dir, f'pipeline_{pipeline_step}_pr_curves.json')
+    with open(curves_file, 'w') as file:
+        json.dump(curves, file, indent=2)
+
+    print(f"Best operating points for step {pipeline_step}:")
+    for entity, curve in curves.items():
+        best = curve['best']
+        if best is not None:
+            print(f"  {entity}: threshold {best['threshold']:.3f} -> Precision {best['precision']:.4f}, "
+                  f"Recall {best['recall']:.4f}, F1 {best['f1']:.4f}")
+
+def execute_pipeline(config_file_path, output_dir, store_path=DEFAULT_STORE_PATH):
+    """Execute the pipeline steps as defined in the configuration file.
+
+    When `store_path` is set, predictions are memoized in a PredictionStore and
+    only texts without a stored prediction are sent through the model.
+    """
     pipeline = load_pipeline_from_yaml(config_file_path)
     print("\n\nPIPELINES EXECUTION LAUNCH\n")
     all_results = []
 
     os.makedirs(output_dir, exist_ok=True)
+    store = PredictionStore(store_path) if store_path else None
 
     if pipeline:
         for i, step in enumerate(pipeline):
@@ -69,11 +90,25 @@ def execute_pipeline(config_file_path, output_dir):
                 continue
 
             conf_file = step.get("conf")
-            anonymizer = provider_class(conf_file=conf_file)
+            provider_kwargs = {"conf_file": conf_file}
+            if step.get("doc_store"):
+                provider_kwargs["doc_store_dir"] = step["doc_store"]
+            if step.get("ner_scores"):
+                provider_kwargs["ner_scores"] = True
+            anonymizer = provider_class(**provider_kwargs)
             
             if isinstance(anonymizer, SpacyAnonymizer):
                 ground_truth_path = step.get("ground_truth_path")
-                results = anonymizer.extract_and_anonymize(ground_truth_path)
+                if store is not None:
+                    hits, misses = store.hits, store.misses
+                    results = []
+                    with anonymizer.load_ground_truth(ground_truth_path) as dataset:
+                        for texts_data in dataset.iter_batches():
+                            batch = memoized_anonymize(store, anonymizer, [text['text'] for text in texts_data])
+                            results.extend(anonymizer.attach_ground_truth(batch, texts_data))
+                    print(f"Prediction cache for step {i+1}: {store.hits - hits} hit(s), {store.misses - misses} miss(es)")
+                else:
+                    results = anonymizer.extract_and_anonymize(ground_truth_path)
             else:
                 raise TypeError("Unsupported anonymizer type.")
             end_time = time.time()  # End timing
@@ -106,10 +141,24 @@ def execute_pipeline(config_file_path, output_dir):
         for step, results, step_duration in all_results:
             evaluation_metrics = evaluate_results(results, ground_truth_path)
             save_evaluation_metrics(evaluation_metrics, output_dir, step, execution_time=step_duration)
+            save_pr_curves(sweep_thresholds(results, ground_truth_path), output_dir, step)
+
+    if store is not None:
+        print_stats(store.stats())
+        store.close()
     
     return all_results
 
 if __name__ == "__main__":
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else 'crosscomp_results'
-    results = execute_pipeline('CROSSCOMP/conf/pipeline_config.yaml', output_dir)
+    parser = argparse.ArgumentParser(description="Execute the CROSSCOMP anonymization pipeline.")
+    parser.add_argument('-o', '--output', type=str, default='crosscomp_results',
+                        help='Directory where evaluation metrics are saved.')
+    parser.add_argument('--prediction-store', type=str, default=DEFAULT_STORE_PATH,
+                        help=f'Path to the prediction store (default: {DEFAULT_STORE_PATH}).')
+    parser.add_argument('--no-prediction-store', action='store_true',
+                        help='Recompute every prediction without reading or writing the store.')
+    args = parser.parse_args()
+
+    store_path = None if args.no_prediction_store else args.prediction_store
+    results = execute_pipeline('CROSSCOMP/conf/pipeline_config.yaml', args.output, store_path=store_path)
     print("EXITING crosscomp_pipeline.py\n")
@@ -1,7 +1,12 @@
-import yaml
+import os
+import sys
 from typing import List, Dict, Any
 from sklearn.metrics import precision_recall_fscore_support
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/backend')))
+from anonymizers.ground_truth import GroundTruthDataset
+from evaluation import threshold_sweep
+
 def evaluate_results(predictions: List[Dict[str, Any]], ground_truth_path: str) -> Dict[str, Dict[str, float]]:
     """Evaluate the anonymization results against ground truth annotations."""
     
@@ -15,24 +20,25 @@ def evaluate_results(predictions: List[Dict[str, Any]], ground_truth_path: str)
         y_pred = [1 if label in pred_labels else 0 for label in all_labels]
         return precision_recall_fscore_support(y_true, y_pred, average='macro')
 
-    with open(ground_truth_path, 'r') as f:
-        ground_truth_data = yaml.safe_load(f)
-
-    ground_truth_texts = {text['text']: text.get('annotations', []) for text in ground_truth_data.get('texts', [])}
+    # Look up the annotations of every prediction by its ground truth id
+    with GroundTruthDataset(ground_truth_path) as ground_truth:
+        annotations = []
+        for result in predictions:
+            record = ground_truth.get(result.get('id'))
+            annotations.append(record.get('annotations', []) if record else [])
 
     # Initialize dictionaries to collect metrics by entity type
     all_true_labels = set()
     all_pred_labels = set()
     entity_metrics = {}
 
-    for result in predictions:
+    for result, ground_truth_labels in zip(predictions, annotations):
         original_text = result['original_text']
         predicted_labels = result['labels']
-        ground_truth_labels = ground_truth_texts.get(original_text, [])
         
         # Create sets of label positions for comparison
         true_labels = {(label['start'], label['end'], label['label']) for label in ground_truth_labels}
-        pred_labels = {(label['start'], label['end'], label['label']) for label in predicted_labels}
+        pred_labels = {(start, end, label) for label, start, end in predicted_labels.keys()}
 
         # Identify overlapping predictions
         overlapping_true_labels = set()
@@ -78,15 +84,14 @@ def evaluate_results(predictions: List[Dict[str, Any]], ground_truth_path: str)
 
     # Debugging Information
     print("Debug Info for Results and Extracted Data:")
-    for result in predictions:
+    for result, ground_truth_labels in zip(predictions, annotations):
         original_text = result['original_text']
         predicted_labels = result['labels']
-        ground_truth_labels = ground_truth_texts.get(original_text, [])
         print(f"Debug Info for Result - Original Text: {original_text}")
         print(f"Predicted Labels: {predicted_labels}")
         print(f"Ground Truth Labels: {ground_truth_labels}")
         true_labels_set = {(label['start'], label['end'], label['label']) for label in ground_truth_labels}
-        pred_labels_set = {(label['start'], label['end'], label['label']) for label in predicted_labels}
+        pred_labels_set = {(start, end, label) for label, start, end in predicted_labels.keys()}
         print(f"True Labels Set: {true_labels_set}")
         print(f"Predicted Labels Set: {pred_labels_set}")
         print("="*40)
@@ -112,3 +117,17 @@ def evaluate_results(predictions: List[Dict[str, Any]], ground_truth_path: str)
         },
         'by_entity': entity_metrics_result
     }
+
+
+def sweep_thresholds(predictions: List[Dict[str, Any]], ground_truth_path: str) -> Dict[str, Dict[str, Any]]:
+    """Compute PR curves and the best score threshold per entity from a single set of predictions."""
+    true_entities = []
+    predicted_entities = []
+    with GroundTruthDataset(ground_truth_path) as ground_truth:
+        for result in predictions:
+            record = ground_truth.get(result.get('id')) or {}
+            true_entities.append([(label['label'], label['start'], label['end'])
+                                  for label in record.get('annotations', [])])
+            predicted_entities.append(result['labels'])
+
+    return threshold_sweep(true_entities, predicted_entities)
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from typing import List, Dict, Any, Iterable, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/backend')))
+from anonymizers.spans import SpanList
+
+DEFAULT_STORE_PATH = 'CROSSCOMP/cache/predictions.sqlite3'
+# Part of every store key; bump it when the stored result format changes (2: labels carry scores)
+RESULT_FORMAT = 2
+
+def hash_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def provider_config_hash(anonymizer) -> str:
+    """Hash the result format, provider class and scoring option together with the content of its configuration file."""
+    digest = hashlib.sha256(f"{RESULT_FORMAT}:{type(anonymizer).__name__}:{getattr(anonymizer, 'ner_scores', False)}".encode('utf-8'))
+    if anonymizer.conf_file:
+        with open(anonymizer.conf_file, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+class PredictionStore:
+    """SQLite-backed memo of anonymization results keyed by model, provider config and text."""
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH) -> None:
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS predictions (
+                model_name TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                config_hash TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (model_name, model_version, config_hash, text_hash)
+            )"""
+        )
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model_name: str, model_version: str, config_hash: str,
+                 text_hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Return the stored results for the given text hashes, keyed by text hash."""
+        text_hashes = list(set(text_hashes))
+        found = {}
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(text_hashes), 500):
+            chunk = text_hashes[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.connection.execute(
+                f"""SELECT text_hash, result FROM predictions
+                    WHERE model_name = ? AND model_version = ? AND config_hash = ?
+                    AND text_hash IN ({placeholders})""",
+                [model_name, model_version, config_hash, *chunk]
+            )
+            for text_hash, result in rows:
+                result = json.loads(result)
+                result['labels'] = SpanList.from_labels(result['labels'])
+                found[text_hash] = result
+        self.hits += len(found)
+        self.misses += len(text_hashes) - len(found)
+        return found
+
+    def put_many(self, model_name: str, model_version: str, config_hash: str,
+                 results: Dict[str, Dict[str, Any]]) -> None:
+        """Store results keyed by text hash, replacing any existing entries."""
+        now = time.time()
+        self.connection.executemany(
+            """INSERT OR REPLACE INTO predictions
+               (model_name, model_version, config_hash, text_hash, result, created_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            [(model_name, model_version, config_hash, text_hash,
+              json.dumps({**result, 'labels': result['labels'].to_labels()}), now)
+             for text_hash, result in results.items()]
+        )
+        self.connection.commit()
+
+    def invalidate(self, model_name: Optional[str] = None, model_version: Optional[str] = None) -> int:
+        """Delete entries for a model (optionally a single version), or everything if no model is given."""
+        if model_name is None:
+            cursor = self.connection.execute("DELETE FROM predictions")
+        elif model_version is None:
+            cursor = self.connection.execute("DELETE FROM predictions WHERE model_name = ?", (model_name,))
+        else:
+            cursor = self.connection.execute(
+                "DELETE FROM predictions WHERE model_name = ? AND model_version = ?",
+                (model_name, model_version)
+            )
+        self.connection.commit()
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry counts per model and the hit/miss counters of this session."""
+        rows = self.connection.execute(
+            """SELECT model_name, model_version, COUNT(*), COUNT(DISTINCT config_hash)
+               FROM predictions GROUP BY model_name, model_version ORDER BY model_name, model_version"""
+        ).fetchall()
+        return {
+            'path': self.path,
+            'size_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            'entries': sum(row[2] for row in rows),
+            'models': [
+                {'model_name': name, 'model_version': version, 'entries': entries, 'configs': configs}
+                for name, version, entries, configs in rows
+            ],
+            'session_hits': self.hits,
+            'session_misses': self.misses,
+        }
+
+    def close(self) -> None:
+        self.connection.close()
+
+def memoized_anonymize(store: PredictionStore, anonymizer, texts: List[str]) -> List[Dict[str, Any]]:
+    """Run `anonymizer.do_anonymize` only on texts without a stored prediction."""
+    model_name, model_version = anonymizer.model_identity()
+    config_hash = provider_config_hash(anonymizer)
+    text_hashes = [hash_text(text) for text in texts]
+
+    cached = store.get_many(model_name, model_version, config_hash, text_hashes)
+
+    missing = {}
+    for text, text_hash in zip(texts, text_hashes):
+        if text_hash not in cached:
+            missing.setdefault(text_hash, text)
+
+    if missing:
+        computed = anonymizer.do_anonymize(list(missing.values()))
+        new_results = dict(zip(missing.keys(), computed))
+        store.put_many(model_name, model_version, config_hash, new_results)
+        cached.update(new_results)
+
+    # Hand out copies so callers can enrich results without touching shared entries
+    return [dict(cached[text_hash]) for text_hash in text_hashes]
+
+def print_stats(stats: Dict[str, Any]) -> None:
+    """Print store statistics in a readable form."""
+    print(f"Prediction store: {stats['path']} ({stats['size_bytes'] / 1024:.1f} KiB)")
+    print(f"Total entries: {stats['entries']}")
+    for model in stats['models']:
+        print(f"  {model['model_name']}=={model['model_version']}: "
+              f"{model['entries']} entries across {model['configs']} config(s)")
+    print(f"Session hits: {stats['session_hits']}, misses: {stats['session_misses']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the CROSSCOMP prediction store.")
+    parser.add_argument('--store', type=str, default=DEFAULT_STORE_PATH,
+                        help=f'Path to the prediction store (default: {DEFAULT_STORE_PATH}).')
+    parser.add_argument('--stats', action='store_true', help='Print cache statistics.')
+    parser.add_argument('--invalidate', type=str, metavar='MODEL',
+                        help='Delete all stored predictions of the given model name.')
+    parser.add_argument('--version', type=str, help='Restrict --invalidate to a single model version.')
+    parser.add_argument('--clear', action='store_true', help='Delete every stored prediction.')
+
+    args = parser.parse_args()
+
+    store = PredictionStore(args.store)
+    if args.invalidate:
+        removed = store.invalidate(args.invalidate, args.version)
+        print(f"Removed {removed} entries for model {args.invalidate}")
+    elif args.clear:
+        removed = store.invalidate()
+        print(f"Removed {removed} entries")
+    if args.stats or not (args.invalidate or args.clear):
+        print_stats(store.stats())
+    store.close()
+
+if __name__ == "__main__":
+    main()
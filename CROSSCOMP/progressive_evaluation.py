@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import json
+import argparse
+from typing import List, Dict, Any
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/backend')))
+from crosscomp_pipeline import load_pipeline_from_yaml, get_provider_class
+from prediction_store import PredictionStore, memoized_anonymize, DEFAULT_STORE_PATH
+from anonymizers.ground_truth import GroundTruthDataset
+from evaluation import span_counts, sequential_comparison
+
+def _build_anonymizers(pipeline: List[Dict[str, Any]]) -> list:
+    """Instantiate the provider of every step as crosscomp_pipeline.py does."""
+    anonymizers = []
+    for step in pipeline:
+        provider_kwargs = {"conf_file": step.get("conf")}
+        if step.get("doc_store"):
+            provider_kwargs["doc_store_dir"] = step["doc_store"]
+        if step.get("ner_scores"):
+            provider_kwargs["ner_scores"] = True
+        anonymizers.append(get_provider_class(step["provider"])(**provider_kwargs))
+    return anonymizers
+
+def progressive_evaluate(config_file_path: str, output_dir: str, store_path: str = DEFAULT_STORE_PATH,
+                         batch_size: int = 32, min_documents: int = 64, confidence: float = 0.95,
+                         n_resamples: int = 2000, margin: float = 0.0, seed: int = 0) -> Dict[str, Any]:
+    """Evaluate every step on ground truth documents in random order until the F1 differences are resolved.
+
+    After each batch, the span-level micro F1 difference of each later step
+    against step 1 is checked with `evaluation.sequential_comparison`, which
+    spends 1 - `confidence` over the repeated checks. Evaluation stops when every
+    difference is resolved, or when the ground truth runs out.
+    """
+    pipeline = load_pipeline_from_yaml(config_file_path)
+    if len(pipeline) < 2:
+        raise ValueError("Progressive evaluation compares steps, but the pipeline has only one")
+    ground_truth_paths = {step["ground_truth_path"] for step in pipeline}
+    if len(ground_truth_paths) > 1:
+        raise ValueError(f"Steps are compared on the same documents, but use different ground truth: {sorted(ground_truth_paths)}")
+    ground_truth_path = pipeline[0]["ground_truth_path"]
+    anonymizers = _build_anonymizers(pipeline)
+    store = PredictionStore(store_path) if store_path else None
+    os.makedirs(output_dir, exist_ok=True)
+
+    inference_seconds = [0.0 for _ in anonymizers]
+    rounds = []
+
+    with GroundTruthDataset(ground_truth_path) as dataset:
+        order = np.random.default_rng(seed).permutation(dataset.ids())
+        total = len(order)
+
+        def batches():
+            """Run every step on the next batch of documents, yielding counts of shape (steps, documents, 3)."""
+            for start in range(0, total, batch_size):
+                records = [dataset.get(record_id) for record_id in order[start:start + batch_size]]
+                texts = [record['text'] for record in records]
+                true_entities = [[(label['label'], label['start'], label['end']) for label in record.get('annotations', [])]
+                                 for record in records]
+                counts = []
+                for i, anonymizer in enumerate(anonymizers):
+                    step_start = time.perf_counter()
+                    results = memoized_anonymize(store, anonymizer, texts) if store else anonymizer.do_anonymize(texts)
+                    inference_seconds[i] += time.perf_counter() - step_start
+                    counts.append(span_counts(true_entities, [result['labels'] for result in results]))
+                yield np.stack(counts)
+
+        for round_ in sequential_comparison(batches(), total, alpha=1 - confidence, min_documents=min_documents,
+                                            margin=margin, n_resamples=n_resamples, seed=seed):
+            rounds.append(round_)
+            print(f"{round_['documents']:>6}/{total} docs  F1 " + "  ".join(f"{value:.4f}" for value in round_['f1']) +
+                  f"  alpha {round_['alpha']:.4f}  " +
+                  "  ".join(f"d{i + 2}=[{low:+.4f}, {high:+.4f}]{'*' if done else ''}"
+                            for i, ((low, high), done) in enumerate(zip(round_['difference_intervals'], round_['resolved']))))
+
+    if store is not None:
+        store.close()
+
+    seen = rounds[-1]['documents'] if rounds else 0
+    skipped = total - seen
+    report = {
+        'ground_truth_path': ground_truth_path,
+        'documents_total': total,
+        'documents_evaluated': seen,
+        'resolved': bool(rounds) and rounds[-1]['stop'],
+        'confidence': confidence,
+        'margin': margin,
+        'seed': seed,
+        'f1': rounds[-1]['f1'] if rounds else [],
+        'f1_intervals': rounds[-1]['f1_intervals'] if rounds else [],
+        'difference_intervals': rounds[-1]['difference_intervals'] if rounds else [],
+        'inference_saved': {
+            'documents': skipped * len(anonymizers),
+            'fraction': skipped / total if total else 0.0,
+            # Extrapolated from the time spent per document so far, cache hits included
+            'estimated_seconds': sum(seconds / seen * skipped for seconds in inference_seconds) if seen else 0.0,
+        },
+        'rounds': rounds,
+    }
+    with open(os.path.join(output_dir, 'progressive_evaluation.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print the final estimates and the inference saved by stopping early."""
+    status = "resolved" if report['resolved'] else "not resolved (ground truth exhausted)"
+    print(f"\nProgressive evaluation {status} after {report['documents_evaluated']}/{report['documents_total']} documents")
+    for i, (f1, (low, high)) in enumerate(zip(report['f1'], report['f1_intervals'])):
+        print(f"  Step {i + 1}: F1 {f1:.4f} [{low:.4f}, {high:.4f}]")
+    for i, (low, high) in enumerate(report['difference_intervals']):
+        print(f"  Step {i + 2} - Step 1: [{low:+.4f}, {high:+.4f}]")
+    saved = report['inference_saved']
+    print(f"Inference saved: {saved['documents']} document predictions ({saved['fraction']:.0%} of the ground truth), "
+          f"~{saved['estimated_seconds']:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare CROSSCOMP steps on randomly ordered ground truth, stopping early.")
+    parser.add_argument('-c', '--config', type=str, default='CROSSCOMP/conf/pipeline_config.yaml',
+                        help='Pipeline configuration file.')
+    parser.add_argument('-o', '--output', type=str, default='crosscomp_results',
+                        help='Directory where progressive_evaluation.json is saved.')
+    parser.add_argument('-b', '--batch-size', type=int, default=32, help='Documents added per round.')
+    parser.add_argument('--min-documents', type=int, default=64, help='Never stop before this many documents.')
+    parser.add_argument('--confidence', type=float, default=0.95,
+                        help='Overall confidence of the stopping decision, across all rounds and steps.')
+    parser.add_argument('--resamples', type=int, default=2000, help='Bootstrap resamples per round.')
+    parser.add_argument('--margin', type=float, default=0.0,
+                        help='Also stop when a difference is within +/- this F1 margin (0 disables).')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the document order and the bootstrap.')
+    parser.add_argument('--prediction-store', type=str, default=DEFAULT_STORE_PATH,
+                        help=f'Path to the prediction store (default: {DEFAULT_STORE_PATH}).')
+    parser.add_argument('--no-prediction-store', action='store_true',
+                        help='Recompute every prediction without reading or writing the store.')
+    args = parser.parse_args()
+
+    store_path = None if args.no_prediction_store else args.prediction_store
+    print_report(progressive_evaluate(args.config, args.output, store_path=store_path, batch_size=args.batch_size,
+                                      min_documents=args.min_documents, confidence=args.confidence,
+                                      n_resamples=args.resamples, margin=args.margin, seed=args.seed))
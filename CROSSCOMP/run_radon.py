@@ -1,59 +1,179 @@
-import subprocess
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import hashlib
+import json
 import os
 import shutil
 import yaml
 import socket  # Import to get the host machine name
 
-def run_radon_commands(folder_path: str, global_folder: str):
-    """Run Radon commands and save the output to specified path."""
+import radon
+from radon.complexity import cc_visit, cc_rank
+from radon.metrics import mi_visit, mi_rank, h_visit
+
+CACHE_FILE = "radon_cache.json"
+
+# Output folder name and description of each Radon analysis
+RADON_ANALYSES = {
+    "cc": "Cyclomatic Complexity",
+    "mi": "Maintainability Index",
+    "hal": "Halstead Metrics",
+}
+
+def analyze_source(code: str) -> dict:
+    """Run the cc, mi and hal analyses on one file's source with Radon's Python API."""
+    blocks = []
+    for block in cc_visit(code):
+        blocks.append(block)
+        blocks.extend(getattr(block, "methods", []))
+
+    halstead = h_visit(code)
+    mi = mi_visit(code, multi=True)
+    return {
+        "cc": [
+            {
+                "name": block.fullname,
+                "type": "class" if not hasattr(block, "is_method") else "method" if block.is_method else "function",
+                "lineno": block.lineno,
+                "endline": block.endline,
+                "complexity": block.complexity,
+                "rank": cc_rank(block.complexity),
+            }
+            for block in blocks
+        ],
+        "mi": {"mi": mi, "rank": mi_rank(mi)},
+        "hal": {
+            "total": halstead.total._asdict(),
+            "functions": {name: report._asdict() for name, report in halstead.functions},
+        },
+    }
+
+def analyze_file(path: str) -> dict:
+    """Analyze one file, returning its content hash with either results or an error."""
+    with open(path, "rb") as f:
+        content = f.read()
+    entry = {"sha256": hashlib.sha256(content).hexdigest()}
+    try:
+        entry["results"] = analyze_source(content.decode("utf-8"))
+    except (SyntaxError, UnicodeDecodeError) as e:
+        entry["error"] = str(e)
+    return entry
+
+def _file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def collect_python_files(folder_path: str) -> list:
+    """List the Python files under a folder, sorted for stable output."""
+    paths = []
+    for root, dirs, files in os.walk(folder_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != "__pycache__")
+        paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".py"))
+    return paths
+
+def load_cache(global_folder: str) -> dict:
+    """Load the results index of previous runs: {"radon_version", "roots": {analyzed folder: {file: entry}}}.
+
+    An index written by another Radon version (or in an older layout) is discarded.
+    """
+    try:
+        with open(os.path.join(global_folder, CACHE_FILE), "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if cache.get("radon_version") != radon.__version__ or not isinstance(cache.get("roots"), dict):
+        return {"radon_version": radon.__version__, "roots": {}}
+    return cache
+
+def save_cache(global_folder: str, cache: dict) -> None:
+    cache_path = os.path.join(global_folder, CACHE_FILE)
+    with open(cache_path + ".tmp", "w") as f:
+        json.dump(cache, f)
+    os.replace(cache_path + ".tmp", cache_path)
+
+def run_radon_commands(folder_path: str, global_folder: str, workers: int = None):
+    """Run the Radon analyses in-process and save per-file JSON results for this run.
+
+    Files whose content hash matches the cached index are not re-analyzed; the
+    remaining files are analyzed in parallel worker processes. The index is kept
+    per analyzed folder (by absolute path), so runs over other folders share the
+    output folder without touching each other's entries.
+    """
     # Define the current date and time for the output file name
     now = datetime.now()
     timestamp = now.strftime("%Y%m%d_%H%M%S")
 
-    # Define the Radon analysis commands and their descriptions
-    radon_folders = {
-        "cc": "Cyclomatic Complexity",
-        "mi": "Maintainability Index",
-        "hal": "Halstead Metrics",
-    }
-
     # Create a folder for this specific run inside the radon_analysis folder
     run_folder = os.path.join(global_folder, f"run_{timestamp}")
     os.makedirs(run_folder, exist_ok=True)
 
-    # Define the Radon commands
-    commands = {
-        "cc": ["radon", "cc", folder_path],
-        "mi": ["radon", "mi", folder_path],
-        "hal": ["radon", "hal", folder_path],
-    }
-
-    for key, description in radon_folders.items():
+    index = load_cache(global_folder)
+    root = os.path.abspath(folder_path)
+    cache = index["roots"].get(root, {})
+    paths = collect_python_files(folder_path)
+    keys = {path: os.path.relpath(path, folder_path) for path in paths}
+
+    stale = [path for path in paths
+             if keys[path] not in cache or cache[keys[path]]["sha256"] != _file_hash(path)]
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for path, entry in zip(stale, executor.map(analyze_file, stale)):
+                cache[keys[path]] = entry
+
+    # Forget files of this folder that no longer exist
+    cache = {key: cache[key] for key in keys.values()}
+    index["roots"][root] = cache
+    save_cache(global_folder, index)
+    print(f"Analyzed {len(stale)} changed file(s), reused {len(paths) - len(stale)} cached result(s)")
+
+    for key, description in RADON_ANALYSES.items():
         # Create a specific folder for each Radon analysis type inside the run folder
         analysis_folder = os.path.join(run_folder, f"{key}_{description.replace(' ', '_')}")
         os.makedirs(analysis_folder, exist_ok=True)
-        output_file = os.path.join(analysis_folder, "output.txt")
-
-        with open(output_file, "w") as f:
-            command = commands[key]
-            try:
-                # Run the command and capture the output
-                result = subprocess.run(command, capture_output=True, text=True, check=True)
-                
-                # Write the command and its output to the file
-                f.write(f"Command: {' '.join(command)}\n")
-                f.write(result.stdout)
-                f.write("\n" + "="*80 + "\n")
-            except subprocess.CalledProcessError as e:
-                # Write any errors to the file
-                f.write(f"Command: {' '.join(command)}\n")
-                f.write(f"Error: {e}\n")
-                f.write("\n" + "="*80 + "\n")
+        output = {
+            "path": folder_path,
+            "analysis": key,
+            "files": {
+                name: entry["results"][key] if "results" in entry else {"error": entry["error"]}
+                for name, entry in cache.items()
+            },
+        }
+        with open(os.path.join(analysis_folder, "output.json"), "w") as f:
+            json.dump(output, f, indent=2)
 
         print(f"Saved {description} results in folder: {analysis_folder}")
 
+    return run_folder
+
+def load_trends(global_folder: str) -> dict:
+    """Return each file's maintainability index and total complexity across run_* folders.
+
+    The result maps file -> list of {"run", "mi", "cc_total"} in run order. Runs
+    saved in the older text format are skipped.
+    """
+    trends = {}
+    mi_folder = f"mi_{RADON_ANALYSES['mi'].replace(' ', '_')}"
+    cc_folder = f"cc_{RADON_ANALYSES['cc'].replace(' ', '_')}"
+    for run in sorted(os.listdir(global_folder)):
+        mi_path = os.path.join(global_folder, run, mi_folder, "output.json")
+        cc_path = os.path.join(global_folder, run, cc_folder, "output.json")
+        if not (run.startswith("run_") and os.path.exists(mi_path) and os.path.exists(cc_path)):
+            continue
+        with open(mi_path, "r") as f:
+            mi_files = json.load(f)["files"]
+        with open(cc_path, "r") as f:
+            cc_files = json.load(f)["files"]
+        for name, mi in mi_files.items():
+            blocks = cc_files.get(name, [])
+            trends.setdefault(name, []).append({
+                "run": run,
+                "mi": mi.get("mi"),
+                # Class blocks aggregate their methods, so only functions and methods are summed
+                "cc_total": sum(block["complexity"] for block in blocks if block["type"] != "class") if isinstance(blocks, list) else None,
+            })
+    return trends
+
 def delete_radon_folders(global_folder: str, yaml_file: str):
     """Delete Radon analysis folders except those listed in the YAML file."""
     def load_folders_to_keep(yaml_file: str):
@@ -84,6 +204,8 @@ def main():
     parser.add_argument("-p", "--path", default="./src/backend", required=True, help="Path to the folder to analyze.")
     parser.add_argument("-o", "--output", default="./CROSSCOMP", help="Path to the Radon analysis global folder.")
     parser.add_argument("-d", "--delete", help="Path to the YAML file listing folders to keep. If provided, deletes other folders.")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes (default: number of CPUs).")
+    parser.add_argument("--trend", action="store_true", help="Print per-file maintainability trends across runs instead of analyzing.")
     
     # Parse the arguments
     args = parser.parse_args()
@@ -102,8 +224,14 @@ def main():
     if args.delete:
         delete_radon_folders(global_folder, args.delete)
 
-    # Run the Radon commands
-    run_radon_commands(args.path, global_folder)
+    if args.trend:
+        for name, points in load_trends(global_folder).items():
+            values = ", ".join(f"{point['run'][4:]}: MI {point['mi']:.1f} CC {point['cc_total']}" for point in points if point["mi"] is not None)
+            print(f"{name}: {values}")
+        return
+
+    # Run the Radon analyses
+    run_radon_commands(args.path, global_folder, workers=args.jobs)
 
 if __name__ == "__main__":
     main()
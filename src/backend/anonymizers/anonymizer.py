@@ -1,10 +1,15 @@
 from presidio_analyzer import AnalyzerEngine, RecognizerRegistry
 from presidio_analyzer.nlp_engine import NlpEngineProvider
-from presidio_anonymizer import AnonymizerEngine, OperatorConfig
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from abc import ABC, abstractmethod
+import hashlib
+import json
 import yaml
 
+from .model_pool import get_model_pool
+from .incremental import IncrementalAnalyzer
+from .spans import SpanList
+
 class Anonymizer(ABC):
     def __init__(self, *, conf_file: str, 
                  models_file: str = None,  # Make models_file optional
@@ -12,49 +17,62 @@ class Anonymizer(ABC):
         self.conf_file = conf_file
         self.models_file = models_file
         self.entities = entities
+        self._incremental = None
     
-    def _anonymize(self, texts: List[str], results: List[List[Dict[str, Any]]]) -> List[str]:
+    def _anonymize(self, texts: List[str], results: List[SpanList]) -> List[str]:
         """Anonymize the texts based on provided results."""
-        anonymizer = AnonymizerEngine()
-        anonymization_config = OperatorConfig(operator_name="replace", params={"new_value": "****"})
-        operators = {entity: anonymization_config for entity in self.entities}
-        
         if isinstance(texts, list):
-            anonymized_texts = []
-            for i in range(len(texts)):
-                anonymized_texts.append(anonymizer.anonymize(
-                    text=texts[i], 
-                    analyzer_results=results[i], 
-                    operators=operators
-                ).text)
-        else:
-            anonymized_texts = anonymizer.anonymize(
-                text=texts, 
-                analyzer_results=results, 
-                operators=operators
-            ).text
-        
-        return anonymized_texts
+            return [spans.mask(text) for text, spans in zip(texts, results)]
+        return results.mask(texts)
 
-    def _analyze(self, texts: List[str], nlp_configuration: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
-        """Analyze texts using the provided NLP configuration."""
+    def _pool_key(self, nlp_configuration: Dict[str, Any]) -> str:
+        """Key an NLP configuration in the model pool as '<model name>#<config hash>'."""
+        model_name = nlp_configuration["models"][0]["model_name"]
+        if isinstance(model_name, dict):
+            model_name = model_name.get("transformers") or model_name.get("spacy")
+        digest = hashlib.sha256(json.dumps(nlp_configuration, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{model_name}#{digest[:12]}"
+
+    def _build_analyzer(self, nlp_configuration: Dict[str, Any]) -> AnalyzerEngine:
         provider = NlpEngineProvider(nlp_configuration=nlp_configuration)
         nlp_engine = provider.create_engine()
 
-        analyzer = AnalyzerEngine(
+        return AnalyzerEngine(
             nlp_engine=nlp_engine, 
             supported_languages=["en"]
         )
 
+    def _analyze(self, texts: List[str], nlp_configuration: Dict[str, Any]) -> List[SpanList]:
+        """Analyze texts using the provided NLP configuration."""
+        # Copy the configuration: providers may mutate theirs while iterating over models
+        nlp_configuration = json.loads(json.dumps(nlp_configuration))
+        analyzer = get_model_pool().get(self._pool_key(nlp_configuration),
+                                        lambda: self._build_analyzer(nlp_configuration))
+
         if isinstance(texts, list):
             results = []
             for text in texts:
-                results.append(analyzer.analyze(text=text, entities=self.entities, language="en"))
+                results.append(SpanList.from_recognizer_results(
+                    analyzer.analyze(text=text, entities=self.entities, language="en")))
         else:
-            results = analyzer.analyze(text=texts, entities=self.entities, language="en")
+            results = SpanList.from_recognizer_results(
+                analyzer.analyze(text=texts, entities=self.entities, language="en"))
         
         return results
 
+    def analyze(self, texts: List[str]) -> List[SpanList]:
+        """Analyze texts with every configured model and merge the results per text."""
+        merged = None
+        for model, nlp_configuration in self._get_nlp_configuration():
+            results = self._analyze(texts, nlp_configuration)
+            if merged is None:
+                merged = results
+            elif isinstance(texts, list):
+                merged = [previous + current for previous, current in zip(merged, results)]
+            else:
+                merged = merged + results
+        return merged
+
     def do_anonymize(self, texts: List[str]) -> List[str]:
         """Apply anonymization to the texts."""
         nlp_configurations = self._get_nlp_configuration()
@@ -66,6 +84,25 @@ class Anonymizer(ABC):
         
         return anonymized_texts
 
+    def do_anonymize_incremental(self, text: str, mode: str = "paragraph") -> Tuple[str, Dict[str, int]]:
+        """Anonymize an edited document, re-analyzing only the blocks that changed since earlier calls.
+
+        Returns the anonymized text and block statistics ({"blocks", "reused", "analyzed"}).
+        """
+        incremental = self._incremental
+        if incremental is None or incremental.mode != mode:
+            incremental = self._incremental = IncrementalAnalyzer(self.analyze, mode=mode)
+        results, stats = incremental.analyze(text)
+        return self._anonymize(text, results), stats
+
+    def snapshot_state(self) -> Optional[Dict[str, Any]]:
+        """Return the built state a startup snapshot can restore this provider from, or None to rebuild it."""
+        return None
+
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """Restore the state returned by `snapshot_state`."""
+        pass
+
     @abstractmethod
     def _get_nlp_configuration(self) -> List[Dict[str, Any]]:
         """Return the NLP configurations required for the analyzer."""
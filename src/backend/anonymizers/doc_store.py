@@ -0,0 +1,100 @@
+from collections import OrderedDict
+from typing import List, Dict
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+from spacy.tokens import Doc, DocBin
+from spacy.vocab import Vocab
+
+# Part of the store directory name; bump it when the layout or what is stored on the Docs changes
+# (2: NER scores, 3: append-only index)
+STORE_FORMAT = 3
+
+class DocStore:
+    """On-disk cache of parsed SpaCy Docs for one model, keyed by text hash.
+
+    Docs are written as DocBin shards under `<root>/<model>-<version>-v<format>/`, with an
+    append-only index.jsonl mapping each text hash to its shard and position. The
+    index is held in memory and only the lines other writers appended since the
+    last read are loaded. A shard is read and deserialized into a standalone Vocab
+    the first time one of its Docs is needed and kept for the `max_shards` most
+    recently used shards, so cached Docs can be used without loading the model at all.
+    """
+
+    def __init__(self, root: str, model_name: str, model_version: str, max_shards: int = 64) -> None:
+        self.directory = os.path.join(root, f"{model_name.replace('/', '_')}-{model_version}-v{STORE_FORMAT}")
+        os.makedirs(self.directory, exist_ok=True)
+        self.index_path = os.path.join(self.directory, "index.jsonl")
+        self.max_shards = max_shards
+        self.vocab = Vocab()
+        self._index = {}
+        self._index_offset = 0
+        self._shards = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _refresh_index(self) -> None:
+        """Add the complete index lines written since the last refresh to the in-memory index."""
+        try:
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_offset)
+                data = f.read()
+        except OSError:
+            return
+        # A line still being appended by another writer is read on a later refresh
+        data = data[:data.rfind(b"\n") + 1]
+        for line in data.splitlines():
+            try:
+                text_hash, shard, position = json.loads(line)
+            except ValueError:
+                continue
+            self._index[text_hash] = (shard, position)
+        self._index_offset += len(data)
+
+    def _load_shard(self, shard: str) -> List[Doc]:
+        if shard in self._shards:
+            self._shards.move_to_end(shard)
+        else:
+            # DocBin decompresses the whole shard, so the file is read in one go
+            with open(os.path.join(self.directory, shard), "rb") as f:
+                doc_bin = DocBin().from_bytes(f.read())
+            self._shards[shard] = list(doc_bin.get_docs(self.vocab))
+            while len(self._shards) > self.max_shards:
+                self._shards.popitem(last=False)
+        return self._shards[shard]
+
+    def get_many(self, texts: List[str]) -> Dict[int, Doc]:
+        """Return the cached Docs of the given texts, keyed by position in `texts`."""
+        found = {}
+        with self._lock:
+            self._refresh_index()
+            for i, text in enumerate(texts):
+                entry = self._index.get(self.hash_text(text))
+                if entry is not None:
+                    shard, position = entry
+                    found[i] = self._load_shard(shard)[position]
+        return found
+
+    def put_many(self, docs: List[Doc]) -> None:
+        """Serialize Docs into a new shard and append their entries to the index."""
+        if not docs:
+            return
+        shard = f"{uuid.uuid4().hex}.spacy"
+        doc_bin = DocBin(docs=docs)
+        with open(os.path.join(self.directory, shard), "wb") as f:
+            f.write(doc_bin.to_bytes())
+
+        entries = [(self.hash_text(doc.text), shard, position) for position, doc in enumerate(docs)]
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+        with self._lock:
+            # One appending write per shard, so concurrent writers do not interleave their lines
+            with open(self.index_path, "a") as f:
+                f.write(lines)
+            for text_hash, shard, position in entries:
+                self._index[text_hash] = (shard, position)
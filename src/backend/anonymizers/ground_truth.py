@@ -0,0 +1,155 @@
+from typing import List, Dict, Any, Iterator, Optional
+import argparse
+import json
+import mmap
+import os
+import yaml
+
+INDEX_VERSION = 1
+
+def _index_path(path: str) -> str:
+    return path + ".idx"
+
+def _source_signature(path: str) -> Dict[str, int]:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def build_index(path: str) -> Dict[str, Any]:
+    """Scan a JSONL ground truth file and write its id -> byte offset index next to it."""
+    offsets = {}
+    with open(path, "rb") as f:
+        offset = 0
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                record_id = str(json.loads(line)["id"])
+                if record_id in offsets:
+                    raise ValueError(f"Duplicate ground truth id {record_id!r} on line {line_number} of {path}")
+                offsets[record_id] = offset
+            offset += len(line)
+
+    index = {
+        "version": INDEX_VERSION,
+        "source": _source_signature(path),
+        "offsets": offsets
+    }
+    with open(_index_path(path), "w") as f:
+        json.dump(index, f)
+    return index
+
+class GroundTruthDataset:
+    """Streaming, id-indexed access to a JSONL ground truth file.
+
+    Each line holds one record: {"id": ..., "text": ..., "annotations": [...]}.
+    Iteration streams records from disk; `get` seeks to a single record through
+    the offset index, which is (re)built whenever the data file changes.
+    """
+
+    def __init__(self, path: str) -> None:
+        if not path.endswith(".jsonl"):
+            raise ValueError(
+                f"Ground truth must be a .jsonl file, got {path}. "
+                f"Convert YAML files with: python src/backend/anonymizers/ground_truth.py {path} <output>.jsonl"
+            )
+        self.path = path
+        self._index = None
+        self._file = None
+        self._mmap = None
+
+    @property
+    def offsets(self) -> Dict[str, int]:
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index["offsets"]
+
+    def _load_index(self) -> Dict[str, Any]:
+        try:
+            with open(_index_path(self.path), "r") as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION and index.get("source") == _source_signature(self.path):
+                return index
+        except (OSError, ValueError):
+            pass
+        return build_index(self.path)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_batches(self, batch_size: int = 256) -> Iterator[List[Dict[str, Any]]]:
+        """Stream records in lists of at most `batch_size`."""
+        batch = []
+        for record in self:
+            batch.append(record)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def ids(self) -> List[str]:
+        return list(self.offsets)
+
+    def get(self, record_id: Any, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Return the record with the given id, reading only that line."""
+        offset = self.offsets.get(str(record_id))
+        if offset is None:
+            return default
+        if self._mmap is None:
+            self._file = open(self.path, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        end = self._mmap.find(b"\n", offset)
+        line = self._mmap[offset:] if end == -1 else self._mmap[offset:end]
+        return json.loads(line)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+    def __enter__(self) -> "GroundTruthDataset":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+def convert_yaml_to_jsonl(yaml_path: str, jsonl_path: str) -> int:
+    """Convert a `texts:` YAML ground truth file to JSONL and index it.
+
+    Records without an id get their 1-based position as id; duplicate ids are rejected.
+    """
+    with open(yaml_path, "r") as f:
+        data = yaml.safe_load(f)
+
+    seen = set()
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for position, entry in enumerate(data.get("texts", []), start=1):
+            if not isinstance(entry, dict) or "text" not in entry:
+                raise ValueError("Each entry in texts should be a dictionary with 'text' key.")
+            record = {
+                "id": entry.get("id", position),
+                "text": entry["text"],
+                "annotations": entry.get("annotations", [])
+            }
+            if str(record["id"]) in seen:
+                raise ValueError(f"Duplicate ground truth id {record['id']!r} in {yaml_path}")
+            seen.add(str(record["id"]))
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    build_index(jsonl_path)
+    return len(seen)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a YAML ground truth file to indexed JSONL")
+    parser.add_argument("yaml_path", help="YAML file with a top-level 'texts' list")
+    parser.add_argument("jsonl_path", help="Destination .jsonl file (its .idx index is written alongside)")
+    args = parser.parse_args()
+
+    count = convert_yaml_to_jsonl(args.yaml_path, args.jsonl_path)
+    print(f"Converted {count} records to {args.jsonl_path}")
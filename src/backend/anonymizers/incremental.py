@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from typing import List, Dict, Callable, Tuple
+import hashlib
+import re
+import threading
+
+from .spans import SpanList
+
+PARAGRAPH_BOUNDARY = re.compile(r"\n[ \t]*\n\s*")
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n[ \t]*\n\s*")
+
+def split_blocks(text: str, mode: str = "paragraph") -> List[Tuple[int, str]]:
+    """Split a text into (start offset, block) pairs at paragraph or sentence boundaries."""
+    boundary = SENTENCE_BOUNDARY if mode == "sentence" else PARAGRAPH_BOUNDARY
+    blocks = []
+    start = 0
+    for match in boundary.finditer(text):
+        if match.start() > start:
+            blocks.append((start, text[start:match.start()]))
+        start = match.end()
+    if start < len(text):
+        blocks.append((start, text[start:]))
+    return blocks
+
+class IncrementalAnalyzer:
+    """Re-analyze only the blocks of a document that changed since they were last seen.
+
+    Spans are cached per block hash relative to the block start, so an unchanged
+    paragraph is reused wherever it moves to in the edited text. Blocks are
+    analyzed without the surrounding document, which loses context that crosses
+    block boundaries.
+    """
+
+    def __init__(self, analyze: Callable[[List[str]], List[SpanList]],
+                 mode: str = "paragraph", max_blocks: int = 10000) -> None:
+        self._analyze = analyze
+        self.mode = mode
+        self.max_blocks = max_blocks
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def analyze(self, text: str) -> Tuple[SpanList, Dict[str, int]]:
+        """Return the spans of `text` with offsets into it, plus reuse statistics."""
+        blocks = split_blocks(text, self.mode)
+        hashes = [hashlib.sha256(block.encode("utf-8")).hexdigest() for _, block in blocks]
+
+        found = {}
+        missing = {}
+        # Called from threadpool threads; the analysis itself runs outside the lock
+        with self._lock:
+            for block_hash, (_, block) in zip(hashes, blocks):
+                if block_hash in self._blocks:
+                    self._blocks.move_to_end(block_hash)
+                    found[block_hash] = self._blocks[block_hash]
+                else:
+                    missing.setdefault(block_hash, block)
+
+        if missing:
+            analyzed = self._analyze(list(missing.values()))
+            with self._lock:
+                for block_hash, spans in zip(missing, analyzed):
+                    found[block_hash] = self._blocks[block_hash] = spans
+                while len(self._blocks) > self.max_blocks:
+                    self._blocks.popitem(last=False)
+
+        spans = SpanList()
+        for block_hash, (offset, _) in zip(hashes, blocks):
+            spans.extend(found[block_hash], offset=offset)
+
+        stats = {"blocks": len(blocks), "reused": len(blocks) - len(missing), "analyzed": len(missing)}
+        return spans, stats
@@ -0,0 +1,214 @@
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Iterable, Optional
+import os
+import threading
+import time
+
+DEFAULT_MAX_MB = 4096
+
+@dataclass
+class PoolEvent:
+    kind: str  # "load" or "evict"
+    key: str
+    size_bytes: int
+    total_bytes: int
+    timestamp: float
+
+def _current_rss() -> int:
+    """Return the resident set size of this process in bytes, or 0 when unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _parameter_bytes(model: Any) -> int:
+    """Sum tensor sizes for torch-style models that expose `parameters()`."""
+    parameters = getattr(model, "parameters", None)
+    if not callable(parameters):
+        return 0
+    try:
+        return sum(p.numel() * p.element_size() for p in parameters())
+    except Exception:
+        return 0
+
+def _spacy_bytes(nlp: Any) -> int:
+    """Sum the vectors and the weights of every component of a spaCy pipeline."""
+    total = getattr(getattr(nlp.vocab, "vectors", None), "data", None)
+    total = getattr(total, "nbytes", 0)
+    for _, component in nlp.pipeline:
+        thinc_model = getattr(component, "model", None)
+        if callable(getattr(thinc_model, "walk", None)):
+            for node in thinc_model.walk():
+                total += sum(node.get_param(name).nbytes for name in node.param_names if node.has_param(name))
+        # Presidio's transformers engine wraps a Hugging Face pipeline in a spaCy component
+        hf_pipeline = getattr(component, "hf_pipeline", None)
+        if hf_pipeline is not None:
+            total += _parameter_bytes(getattr(hf_pipeline, "model", None))
+    return total
+
+def _model_bytes(model: Any) -> int:
+    """Return the size of a loaded model's weights, or 0 for model types it cannot inspect.
+
+    Handles torch-style models, spaCy pipelines and Presidio analyzers and NLP
+    engines (through the spaCy pipelines they hold).
+    """
+    if callable(getattr(model, "parameters", None)):
+        return _parameter_bytes(model)
+    if hasattr(model, "nlp_engine"):
+        return _model_bytes(model.nlp_engine)
+    if isinstance(getattr(model, "nlp", None), dict):
+        return sum(_model_bytes(nlp) for nlp in model.nlp.values())
+    if hasattr(model, "pipeline") and hasattr(model, "vocab"):
+        try:
+            return _spacy_bytes(model)
+        except Exception:
+            return 0
+    return 0
+
+class ModelPool:
+    """Process-wide cache of loaded models kept under a memory cap with LRU eviction.
+
+    A model's footprint is the size of its weights (see `_model_bytes`), or the RSS
+    growth observed while loading it for models that cannot be inspected; that
+    fallback also counts whatever other threads allocate meanwhile. Sizes are
+    remembered after eviction, so when a model's size is known (passed as
+    `size_bytes` or measured by an earlier load) least-recently-used models are
+    evicted to make room before it loads, and the pool never holds more than
+    `max_bytes` plus a new model. Models of unknown size make room only once
+    they are loaded. Pinned models are never evicted. Keys are "<model name>" or
+    "<model name>#<suffix>", and a pin on the model name covers every suffixed
+    variant.
+
+    Loads run outside the pool lock: other keys stay available while a model
+    loads, and concurrent requests for the key being loaded wait for that load.
+    """
+
+    def __init__(self, max_bytes: int, pinned: Iterable[str] = (), history_size: int = 256) -> None:
+        self.max_bytes = max_bytes
+        self.pinned = set(pinned)
+        self.events = deque(maxlen=history_size)
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._reserved = {}
+        self._loading = {}
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    @property
+    def total_bytes(self) -> int:
+        """Bytes held by loaded models plus the known sizes of models being loaded."""
+        return sum(self._sizes[key] for key in self._models) + sum(self._reserved.values())
+
+    def is_pinned(self, key: str) -> bool:
+        return key in self.pinned or key.split("#", 1)[0] in self.pinned
+
+    def pin(self, key: str) -> None:
+        self.pinned.add(key)
+
+    def unpin(self, key: str) -> None:
+        self.pinned.discard(key)
+
+    def subscribe(self, callback: Callable[[PoolEvent], None]) -> None:
+        """Call `callback` with every load and evict event."""
+        self._listeners.append(callback)
+
+    def _emit(self, kind: str, key: str, size_bytes: int) -> None:
+        event = PoolEvent(kind=kind, key=key, size_bytes=size_bytes,
+                          total_bytes=self.total_bytes, timestamp=time.time())
+        self.events.append(event)
+        for callback in self._listeners:
+            callback(event)
+
+    def get(self, key: str, loader: Callable[[], Any], pin: bool = False,
+            size_bytes: Optional[int] = None) -> Any:
+        """Return the model stored under `key`, loading it with `loader` on a miss."""
+        with self._lock:
+            if pin:
+                self.pin(key)
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+            loading = self._loading.get(key)
+            if loading is None:
+                loading = self._loading[key] = Future()
+                owner = True
+                expected_bytes = size_bytes if size_bytes is not None else self._sizes.get(key)
+                if expected_bytes:
+                    # Make room before loading instead of holding the cap plus the new model
+                    self._reserved[key] = expected_bytes
+                    self._shrink(keep=key)
+            else:
+                owner = False
+
+        if not owner:
+            return loading.result()
+
+        try:
+            rss_before = _current_rss()
+            model = loader()
+            if size_bytes is None:
+                size_bytes = _model_bytes(model) or max(_current_rss() - rss_before, 0)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+                self._reserved.pop(key, None)
+            loading.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[key]
+            self._reserved.pop(key, None)
+            self._models[key] = model
+            self._sizes[key] = size_bytes
+            self._emit("load", key, size_bytes)
+            self._shrink(keep=key)
+        loading.set_result(model)
+        return model
+
+    def _shrink(self, keep: str) -> None:
+        for key in list(self._models):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key != keep and not self.is_pinned(key):
+                self.evict(key)
+
+    def evict(self, key: str) -> bool:
+        """Drop a model from the pool, returning False if it was not loaded."""
+        with self._lock:
+            if key not in self._models:
+                return False
+            del self._models[key]
+            # The size is kept so a later reload can make room for the model before loading it
+            size_bytes = self._sizes[key]
+            self._emit("evict", key, size_bytes)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "total_bytes": self.total_bytes,
+                "models": [{"key": key, "size_bytes": self._sizes[key], "pinned": self.is_pinned(key)}
+                           for key in self._models],
+                "events": [asdict(event) for event in self.events],
+            }
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def get_model_pool() -> ModelPool:
+    """Return the pool shared by all anonymizers, configured from the environment.
+
+    ANONYMIZER_MODEL_POOL_MB sets the cap (default 4096) and ANONYMIZER_PINNED_MODELS
+    takes a comma-separated list of model names that must stay loaded.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            max_mb = int(os.environ.get("ANONYMIZER_MODEL_POOL_MB", DEFAULT_MAX_MB))
+            pinned = [name.strip() for name in os.environ.get("ANONYMIZER_PINNED_MODELS", "").split(",") if name.strip()]
+            _default_pool = ModelPool(max_bytes=max_mb * 1024 * 1024, pinned=pinned)
+    return _default_pool
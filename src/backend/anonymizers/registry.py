@@ -0,0 +1,141 @@
+from presidio_analyzer import RecognizerRegistry, PatternRecognizer
+from presidio_analyzer.nlp_engine import NlpEngineProvider
+from typing import List, Dict, Any, Optional
+import copy
+import functools
+import threading
+import time
+
+import spacy
+
+_registries = {}
+_lock = threading.Lock()
+
+class RecognizerTimer:
+    """Accumulate call counts and wall time per recognizer."""
+
+    def __init__(self) -> None:
+        self.calls = {}
+        self.seconds = {}
+
+    def wrap(self, recognizer) -> None:
+        """Replace a recognizer's analyze method with a timed version."""
+        analyze = recognizer.analyze
+        name = recognizer.name
+
+        @functools.wraps(analyze)
+        def timed_analyze(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return analyze(*args, **kwargs)
+            finally:
+                self.calls[name] = self.calls.get(name, 0) + 1
+                self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+
+        recognizer.analyze = timed_analyze
+
+def _precompile(recognizer) -> None:
+    """Compile a pattern recognizer's regexes (deny-lists included) once, up front.
+
+    Presidio compiles patterns lazily on first use and caches them on the Pattern
+    objects, so a throwaway call on an empty text fills that cache.
+    """
+    if isinstance(recognizer, PatternRecognizer):
+        recognizer.analyze(text="", entities=recognizer.supported_entities, nlp_artifacts=None)
+
+def build_scoped_registry(entities: List[str], conf_file: Optional[str] = None,
+                          language: str = "en") -> RecognizerRegistry:
+    """Build a registry holding only recognizers that can emit one of `entities`.
+
+    Predefined recognizers and those from `conf_file` are filtered by entity and
+    language and their patterns are compiled. The registry is not timed or shared;
+    see `get_scoped_registry`.
+    """
+    registry = RecognizerRegistry(supported_languages=[language])
+    registry.load_predefined_recognizers(languages=[language])
+    if conf_file is not None:
+        registry.add_recognizers_from_yaml(conf_file)
+
+    wanted = set(entities)
+    registry.recognizers = [
+        recognizer for recognizer in registry.recognizers
+        if recognizer.supported_language == language and wanted & set(recognizer.supported_entities)
+    ]
+    for recognizer in registry.recognizers:
+        _precompile(recognizer)
+    return registry
+
+def register_scoped_registry(entities: List[str], conf_file: Optional[str], registry: RecognizerRegistry,
+                             language: str = "en") -> RecognizerRegistry:
+    """Share an already built registry (e.g. from a snapshot) as the scoped registry for these arguments."""
+    key = (tuple(sorted(entities)), conf_file, language)
+    with _lock:
+        if key in _registries:
+            return _registries[key]
+        registry.timer = RecognizerTimer()
+        for recognizer in registry.recognizers:
+            registry.timer.wrap(recognizer)
+        _registries[key] = registry
+        return registry
+
+def get_scoped_registry(entities: List[str], conf_file: Optional[str] = None,
+                        language: str = "en") -> RecognizerRegistry:
+    """Return the registry of recognizers that can emit one of `entities`.
+
+    Registries are built once per process for each (entities, conf_file, language)
+    and shared. Each recognizer is timed (see `describe_registry`).
+    """
+    key = (tuple(sorted(entities)), conf_file, language)
+    with _lock:
+        registry = _registries.get(key)
+    if registry is None:
+        registry = register_scoped_registry(entities, conf_file, build_scoped_registry(entities, conf_file, language),
+                                            language)
+    return registry
+
+def snapshot_nlp_configuration(nlp_configuration: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return a validated NLP engine configuration with installed spaCy packages resolved to their data paths.
+
+    Loading a model from its data path skips the package lookup and the download
+    check Presidio runs for model names.
+    """
+    configuration = copy.deepcopy(NlpEngineProvider(nlp_configuration=nlp_configuration).nlp_configuration)
+    for model in configuration.get("models", []):
+        name = model["model_name"]
+        if isinstance(name, str) and spacy.util.is_package(name):
+            data_path = spacy.util.get_package_path(name) / f"{name}-{spacy.util.get_package_version(name)}"
+            if data_path.exists():
+                model["model_name"] = str(data_path)
+    return configuration
+
+def create_nlp_engine(nlp_configuration: Dict[str, Any]):
+    """Create and load the NLP engine described by a configuration."""
+    return NlpEngineProvider(nlp_configuration=nlp_configuration).create_engine()
+
+def describe_registry(registry: RecognizerRegistry) -> List[Dict[str, Any]]:
+    """List a registry's recognizers with their entities, pattern count and time spent so far."""
+    timer = getattr(registry, "timer", None)
+    description = []
+    for recognizer in registry.recognizers:
+        calls = timer.calls.get(recognizer.name, 0) if timer else 0
+        seconds = timer.seconds.get(recognizer.name, 0.0) if timer else 0.0
+        description.append({
+            "name": recognizer.name,
+            "entities": list(recognizer.supported_entities),
+            "language": recognizer.supported_language,
+            "patterns": len(getattr(recognizer, "patterns", []) or []),
+            "calls": calls,
+            "total_ms": seconds * 1000,
+            "mean_ms": seconds * 1000 / calls if calls else 0.0,
+        })
+    return description
+
+def describe_registries() -> List[Dict[str, Any]]:
+    """Describe every scoped registry built in this process."""
+    with _lock:
+        items = list(_registries.items())
+    return [
+        {"entities": list(entities), "conf_file": conf_file, "language": language,
+         "recognizers": describe_registry(registry)}
+        for (entities, conf_file, language), registry in items
+    ]
@@ -0,0 +1,82 @@
+from presidio_analyzer import AnalyzerEngine
+from typing import List, Optional
+
+from .anonymizer import Anonymizer
+from .model_pool import get_model_pool
+from .spans import SpanList
+from .registry import (get_scoped_registry, build_scoped_registry, register_scoped_registry,
+						describe_registry, snapshot_nlp_configuration, create_nlp_engine)
+
+class ScopedRegistryAnonymizer(Anonymizer):
+	"""Base of the providers running a scoped recognizer registry on Presidio's NLP engine.
+
+	The NLP engine comes from the model pool, keyed by its configuration, so every
+	provider of the process shares one engine and it counts towards the pool cap.
+	Subclasses choose the recognizers through `_registry_conf_file`.
+	"""
+	banner = ""
+
+	def __init__(self, *, conf_file: str, 
+              		models_file: str,
+                	entities: List[str] = ["ORGANIZATION"]) -> None:
+		super().__init__(conf_file=conf_file, models_file=models_file, entities=entities)
+		self._analyzer = None
+		self._engine_configuration = None
+
+	def _registry_conf_file(self) -> Optional[str]:
+		"""Return the recognizer configuration file, or None for Presidio's predefined recognizers."""
+		return None
+
+	def _get_nlp_engine(self):
+		if self._engine_configuration is None:
+			self._engine_configuration = snapshot_nlp_configuration()
+		nlp_configuration = self._engine_configuration
+		return get_model_pool().get(self._pool_key(nlp_configuration), lambda: create_nlp_engine(nlp_configuration))
+
+	def _get_analyzer(self):
+		"""Keep the analyzer warm, rebuilding it around the pooled engine when that was reloaded."""
+		nlp_engine = self._get_nlp_engine()
+		analyzer = self._analyzer
+		if analyzer is None or analyzer.nlp_engine is not nlp_engine:
+			registry = get_scoped_registry(self.entities, self._registry_conf_file())
+			analyzer = self._analyzer = AnalyzerEngine(registry=registry, nlp_engine=nlp_engine)
+		return analyzer
+
+	def snapshot_state(self):
+		"""Return the filtered, compiled registry and the resolved NLP engine configuration."""
+		return {
+			"registry": build_scoped_registry(self.entities, self._registry_conf_file()),
+			"nlp_configuration": snapshot_nlp_configuration()
+		}
+
+	def restore_state(self, state):
+		register_scoped_registry(self.entities, self._registry_conf_file(), state["registry"])
+		self._engine_configuration = state["nlp_configuration"]
+		self._analyzer = None
+
+	def describe_recognizers(self):
+		"""Return the recognizers this anonymizer runs and the time each has taken so far."""
+		return describe_registry(self._get_analyzer().registry)
+
+	def analyze(self, texts):
+		analyzer = self._get_analyzer()
+		
+		if isinstance(texts, list):
+			results = []
+			for text in texts:
+				results.append(SpanList.from_recognizer_results(
+					analyzer.analyze(text=text, entities=self.entities, language="en")))
+		else:
+			results = SpanList.from_recognizer_results(
+				analyzer.analyze(text=texts, entities=self.entities, language="en"))
+		return results
+
+	def do_anonymize(self, texts):
+		results = self.analyze(texts)
+		
+		print(f"\n***************************************************")
+		print(self.banner)
+		print(f"***************************************************")
+		anonymized_texts = self._anonymize(texts, results)
+
+		return anonymized_texts
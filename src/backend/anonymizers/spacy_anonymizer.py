@@ -1,14 +1,52 @@
-from typing import List, Dict, Any
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+import hashlib
 import yaml
 import spacy
+from spacy.tokens import SpanGroup
 
 from .anonymizer import Anonymizer
+from .ground_truth import GroundTruthDataset
+from .model_pool import get_model_pool
+from .doc_store import DocStore
+from .spans import SpanList
+
+# Span group holding the entities with their beam-search probabilities, when scoring is enabled
+NER_SCORES_KEY = "ner_scores"
+NER_BEAM_WIDTH = 16
+
+def model_version(model_name: str) -> str:
+    """Return "<meta version>-<fingerprint>" for an installed or path-loaded SpaCy model.
+
+    The fingerprint hashes meta.json and the path, size and modification time of
+    every file of the model, so a model retrained in place gets a new version even
+    when meta.json keeps the same version number. Returns "unknown" when the model
+    cannot be found on disk.
+    """
+    if spacy.util.is_package(model_name):
+        directory = Path(spacy.util.get_package_path(model_name))
+    else:
+        directory = Path(model_name)
+    meta_path = directory / "meta.json"
+    if not meta_path.is_file():
+        return "unknown"
+
+    digest = hashlib.sha256(meta_path.read_bytes())
+    for path in sorted(directory.rglob("*")):
+        if path.is_file() and "__pycache__" not in path.parts:
+            stat = path.stat()
+            digest.update(f"{path.relative_to(directory)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    version = spacy.util.load_meta(meta_path).get("version", "unknown")
+    return f"{version}-{digest.hexdigest()[:12]}"
 
 class SpacyAnonymizer(Anonymizer):
-    def __init__(self, *, conf_file: str) -> None:
+    def __init__(self, *, conf_file: str, doc_store_dir: str = None, ner_scores: bool = False) -> None:
         super().__init__(conf_file=conf_file)
-        self.nlp = None  # Placeholder for loading Spacy models
         self.entities = []  # Entities to anonymize will be populated from config
+        self.doc_store_dir = doc_store_dir  # Optional DocBin cache of parsed Docs
+        self.ner_scores = ner_scores  # Score NER entities with an extra beam-search pass
+        self._doc_stores = {}  # One DocStore per (model name, version), keeping its index and shards in memory
 
     def _get_nlp_configuration(self) -> Dict[str, Any]:
         """Load the NLP configurations from the provided file."""
@@ -18,35 +56,38 @@ class SpacyAnonymizer(Anonymizer):
             return nlp_configuration
         except Exception as e:
             raise RuntimeError(f"Failed to load NLP configuration: {e}")
-    def extract_and_anonymize(self, ground_truth_path: str) -> List[Dict[str, Any]]:
-        """Extract texts from ground truth file and apply anonymization.""" 
-        with open(ground_truth_path, 'r') as f:
-            data = yaml.safe_load(f)
-        
-        texts_data = data.get('texts', [])
-        
-        if not all(isinstance(text, dict) and 'text' in text for text in texts_data):
-            raise ValueError("Each entry in texts should be a dictionary with 'text' key.")
-        
-        texts = [text['text'] for text in texts_data]
-        ids = [text.get('id', 'Unknown') for text in texts_data]
-        annotations = [text.get('annotations', []) for text in texts_data]
-        
-        # Apply anonymization
-        anonymized_results = self.do_anonymize(texts)
-        
-        # Attach IDs, annotations, and annotated text to results
-        id_to_annotations = {text['text']: text.get('annotations', []) for text in texts_data}
-        id_to_text = {text['text']: text['id'] for text in texts_data}
-        
-        for result in anonymized_results:
-            original_text = result['original_text']
-            result['id'] = id_to_text.get(original_text, 'Unknown')
-            result['annotations'] = id_to_annotations.get(original_text, [])
-            result['ground_truth_annotated_text'] = self._generate_annotated_text(original_text, result['annotations'])
+    def load_ground_truth(self, ground_truth_path: str) -> GroundTruthDataset:
+        """Open the indexed JSONL ground truth file."""
+        return GroundTruthDataset(ground_truth_path)
+
+    def attach_ground_truth(self, anonymized_results: List[Dict[str, Any]], texts_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Attach IDs, annotations, and annotated text to results given in the same order as `texts_data`."""
+        if len(anonymized_results) != len(texts_data):
+            raise ValueError("Each ground truth entry should have exactly one anonymization result.")
+
+        for result, text in zip(anonymized_results, texts_data):
+            result['id'] = text.get('id', 'Unknown')
+            result['annotations'] = text.get('annotations', [])
+            result['ground_truth_annotated_text'] = self._generate_annotated_text(result['original_text'], result['annotations'])
+
+        return anonymized_results
+
+    def extract_and_anonymize(self, ground_truth_path: str, batch_size: int = 256) -> List[Dict[str, Any]]:
+        """Stream texts from the ground truth file and apply anonymization batch by batch.""" 
+        anonymized_results = []
+        with self.load_ground_truth(ground_truth_path) as dataset:
+            for texts_data in dataset.iter_batches(batch_size):
+                texts = [text['text'] for text in texts_data]
+                anonymized_results.extend(self.attach_ground_truth(self.do_anonymize(texts), texts_data))
 
         return anonymized_results
 
+    def model_identity(self) -> Tuple[str, str]:
+        """Return the configured SpaCy model name and its version (see `model_version`)."""
+        nlp_configuration = self._get_nlp_configuration()
+        model_name = nlp_configuration.get("models", [{}])[0].get("model_name", "en_core_web_sm")
+        return model_name, model_version(model_name)
+
     def _generate_annotated_text(self, text: str, annotations: List[Dict[str, Any]]) -> str:
         """Generate annotated text with ground truth annotations."""
         annotated_text = text
@@ -65,45 +106,123 @@ class SpacyAnonymizer(Anonymizer):
         print(f"Extracted entities for anonymization: {entities}")  # Debug print for extracted entities
         return entities
 
-    def _analyze(self, texts: List[str], nlp_configuration: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Analyze and anonymize the texts based on NLP configurations."""
-        if self.nlp is None:
-            model_config = nlp_configuration.get("models", [{}])[0]
-            model_name = model_config.get("model_name", "en_core_web_sm")
+    def _load_model(self, model_name: str):
+        """Fetch a SpaCy pipeline from the shared model pool, loading it on first use."""
+        def load():
             print(f"Loading SpaCy model: {model_name}")  # Debug print for model name
             try:
-                self.nlp = spacy.load(model_name)
+                return spacy.load(model_name)
             except Exception as e:
                 raise RuntimeError(f"Failed to load SpaCy model '{model_name}': {e}")
 
+        return get_model_pool().get(model_name, load)
+
+    def _score_entities(self, nlp, docs: list) -> None:
+        """Store a confidence for every entity as the scored span group NER_SCORES_KEY.
+
+        The greedy NER gives no confidence, so the NER is run again, greedily and
+        with beam search, on copies of the Docs without entities. An entity's score
+        is the total probability of the beam parses that contain it: 0.0 for an NER
+        entity no beam parse contains, and 1.0 for entities that do not come from
+        the NER (e.g. an entity ruler).
+        """
+        ner = nlp.get_pipe("ner") if "ner" in nlp.pipe_names else None
+        if ner is None or not hasattr(ner, "beam_parse"):
+            for doc in docs:
+                doc.spans[NER_SCORES_KEY] = SpanGroup(doc, name=NER_SCORES_KEY, spans=list(doc.ents),
+                                                      attrs={"scores": [1.0] * len(doc.ents)})
+            return
+
+        def cleared_copies():
+            copies = []
+            for doc in docs:
+                copy = doc.copy()
+                # Missing rather than "O" annotations, which the beam would have to keep
+                copy.set_ents([], default="missing")
+                copies.append(copy)
+            return copies
+
+        predicted = [{(ent.start, ent.end, ent.label_) for ent in copy.ents} for copy in ner.pipe(cleared_copies())]
+        beams = ner.beam_parse(cleared_copies(), beam_width=NER_BEAM_WIDTH)
+        for doc, from_ner, beam in zip(docs, predicted, beams):
+            probabilities = defaultdict(float)
+            for probability, parse in ner.moves.get_beam_parses(beam):
+                for start, end, label in parse:
+                    probabilities[(start, end, label)] += probability
+            scores = []
+            for ent in doc.ents:
+                key = (ent.start, ent.end, ent.label_)
+                if key in probabilities:
+                    scores.append(min(probabilities[key], 1.0))
+                else:
+                    scores.append(0.0 if key in from_ner else 1.0)
+            doc.spans[NER_SCORES_KEY] = SpanGroup(doc, name=NER_SCORES_KEY, spans=list(doc.ents),
+                                                  attrs={"scores": scores})
+
+    def _entity_score(self, doc, ent) -> float:
+        """Return the confidence of an entity from a scored span group, or 1.0 when the Doc was not scored."""
+        # Beam-search scores are stored by _score_entities; span categorizers add their own groups
+        for group in doc.spans.values():
+            scores = group.attrs.get("scores")
+            if scores is None:
+                continue
+            for span, score in zip(group, scores):
+                if span.start_char == ent.start_char and span.end_char == ent.end_char and span.label_ == ent.label_:
+                    return float(score)
+        return 1.0
+
+    def _parse(self, texts: List[str], model_name: str) -> list:
+        """Parse texts into Docs, reusing Docs from the DocBin store when one is configured."""
+        if self.doc_store_dir is None:
+            nlp = self._load_model(model_name)
+            docs = [nlp(text) for text in texts]
+            if self.ner_scores:
+                self._score_entities(nlp, docs)
+            return docs
+
+        version = model_version(model_name)
+        store = self._doc_stores.get((model_name, version))
+        if store is None:
+            store = self._doc_stores[(model_name, version)] = DocStore(self.doc_store_dir, model_name, version)
+        docs = store.get_many(texts)
+        if self.ner_scores:
+            # Docs stored by a step without scoring are parsed again, with scores
+            docs = {i: doc for i, doc in docs.items() if NER_SCORES_KEY in doc.spans}
+        missing = [i for i in range(len(texts)) if i not in docs]
+        print(f"Doc store: reusing {len(docs)} parsed doc(s), parsing {len(missing)}")
+        if missing:
+            # The model is only loaded when some texts have not been parsed before
+            nlp = self._load_model(model_name)
+            parsed = list(nlp.pipe(texts[i] for i in missing))
+            if self.ner_scores:
+                self._score_entities(nlp, parsed)
+            store.put_many(parsed)
+            docs.update(zip(missing, parsed))
+        return [docs[i] for i in range(len(texts))]
+
+    def _analyze(self, texts: List[str], nlp_configuration: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Analyze and anonymize the texts based on NLP configurations."""
+        model_config = nlp_configuration.get("models", [{}])[0]
+        model_name = model_config.get("model_name", "en_core_web_sm")
+        docs = self._parse(texts, model_name)
+
         if not self.entities:
             self.entities = self._extract_entities(nlp_configuration)
 
         analysis_results = []
-        for text in texts:
-            doc = self.nlp(text)
+        for text, doc in zip(texts, docs):
             print("Processing text:", text)
             print("Entities found:")
 
             # Collect entities to anonymize
-            labels = []
+            labels = SpanList()
             for ent in doc.ents:
                 if ent.label_ in self.entities:
-                    labels.append({
-                        'label': ent.label_,
-                        'start': ent.start_char,
-                        'end': ent.end_char
-                    })
+                    labels.append(ent.label_, ent.start_char, ent.end_char, self._entity_score(doc, ent))
                     print(f"Entity: {ent.text}, Label: {ent.label_}, Start: {ent.start_char}, End: {ent.end_char}")
 
-            # Anonymize the text by replacing entities in reverse order
-            anonymized_text = text
-            for label in sorted(labels, key=lambda x: x['start'], reverse=True):
-                anonymized_text = (
-                    anonymized_text[:label['start']] 
-                    + f"<{label['label']}>" 
-                    + anonymized_text[label['end']:]
-                )
+            # Anonymize the text by replacing entities with their label
+            anonymized_text = labels.annotate(text)
             
             # Add the anonymized result to the output
             analysis_results.append({
@@ -117,6 +236,16 @@ class SpacyAnonymizer(Anonymizer):
 
         return analysis_results
 
+    def analyze(self, texts: List[str]) -> List[SpanList]:
+        """Return the entity labels found in each text."""
+        return [result['labels'] for result in self._analyze(texts, self._get_nlp_configuration())]
+
+    def _anonymize(self, texts, results):
+        """Replace labelled spans with <LABEL> tags, matching `do_anonymize`."""
+        if isinstance(texts, list):
+            return [labels.annotate(text) for text, labels in zip(texts, results)]
+        return results.annotate(texts)
+
     def do_anonymize(self, texts: List[str]) -> List[Dict[str, Any]]:
         """Apply anonymization to a list of texts.""" 
         nlp_configuration = self._get_nlp_configuration()
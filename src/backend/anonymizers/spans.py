@@ -0,0 +1,188 @@
+from array import array
+from typing import List, Dict, Any, Iterable, Iterator, NamedTuple, Set, Tuple
+import threading
+
+MASK = "****"
+
+_labels = []
+_label_ids = {}
+_labels_lock = threading.Lock()
+
+def intern_label(label: str) -> int:
+    """Return the process-wide id of an entity label, assigning one on first use."""
+    label_id = _label_ids.get(label)
+    if label_id is None:
+        with _labels_lock:
+            label_id = _label_ids.get(label)
+            if label_id is None:
+                label_id = len(_labels)
+                _labels.append(label)
+                _label_ids[label] = label_id
+    return label_id
+
+def label_name(label_id: int) -> str:
+    return _labels[label_id]
+
+class Span(NamedTuple):
+    """A single entity span, materialized on demand from a SpanList."""
+    label: str
+    start: int
+    end: int
+    score: float
+
+class SpanList:
+    """The entity spans of one document, stored in typed arrays with interned label ids.
+
+    A span costs 16 bytes (label id, start and end as 32-bit ints plus a 32-bit
+    float score) instead of a dict or RecognizerResult per entity. Iterating
+    yields `Span` tuples of (label, start, end, score).
+    """
+
+    __slots__ = ("_ints", "_scores")
+
+    def __init__(self, spans: Iterable[Tuple[str, int, int, float]] = ()) -> None:
+        self._ints = array("i")
+        self._scores = array("f")
+        for label, start, end, score in spans:
+            self.append(label, start, end, score)
+
+    @classmethod
+    def from_recognizer_results(cls, results) -> "SpanList":
+        """Build a SpanList from Presidio RecognizerResults."""
+        spans = cls()
+        for result in results:
+            spans.append(result.entity_type, result.start, result.end, result.score)
+        return spans
+
+    @classmethod
+    def from_labels(cls, labels: Iterable[Dict[str, Any]]) -> "SpanList":
+        """Build a SpanList from {'label', 'start', 'end', 'score'} dicts; a missing score counts as 1.0."""
+        spans = cls()
+        for label in labels:
+            spans.append(label["label"], label["start"], label["end"], label.get("score", 1.0))
+        return spans
+
+    def append(self, label: str, start: int, end: int, score: float = 1.0) -> None:
+        self._ints.extend((intern_label(label), start, end))
+        self._scores.append(score)
+
+    def extend(self, other: "SpanList", offset: int = 0) -> None:
+        """Append the spans of another SpanList, moved by `offset` characters."""
+        if not offset:
+            self._ints.extend(other._ints)
+        else:
+            ints = other._ints
+            self._ints.extend(value + offset if i % 3 else value for i, value in enumerate(ints))
+        self._scores.extend(other._scores)
+
+    def __add__(self, other: "SpanList") -> "SpanList":
+        combined = SpanList()
+        combined.extend(self)
+        combined.extend(other)
+        return combined
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __iter__(self) -> Iterator[Span]:
+        ints = self._ints
+        for i, score in enumerate(self._scores):
+            yield Span(_labels[ints[3 * i]], ints[3 * i + 1], ints[3 * i + 2], score)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SpanList):
+            return NotImplemented
+        return self._ints == other._ints and self._scores == other._scores
+
+    def __repr__(self) -> str:
+        return f"SpanList({[tuple(span) for span in self]})"
+
+    def keys(self) -> Set[Tuple[str, int, int]]:
+        """Return the distinct (label, start, end) triples, as used for span-level matching."""
+        ints = self._ints
+        return {(_labels[ints[i]], ints[i + 1], ints[i + 2]) for i in range(0, len(ints), 3)}
+
+    def _ordered(self) -> List[Tuple[int, int, int]]:
+        """Return (start, end, label id) per span, ordered by start and then longest first."""
+        ints = self._ints
+        return sorted(((ints[i + 1], ints[i + 2], ints[i]) for i in range(0, len(ints), 3)),
+                      key=lambda span: (span[0], -span[1]))
+
+    def resolve(self, text: str) -> List[Tuple[int, int, int]]:
+        """Return the (start, end, label id) spans to replace, resolving conflicts as Presidio's anonymizer does.
+
+        Overlapping spans of one label are merged, spans contained in another (or
+        with the same offsets and a lower score) are dropped and spans of one label
+        separated only by spaces are joined. The result is ordered by offset and
+        each end is clipped to the next start, so replacements never overlap.
+        """
+        ints = self._ints
+        spans = sorted(([ints[3 * i + 1], ints[3 * i + 2], ints[3 * i], score]
+                        for i, score in enumerate(self._scores)), key=lambda span: (span[0], span[1]))
+
+        merged = []
+        for i, span in enumerate(spans):
+            for other in spans[i + 1:] + merged:
+                if other[2] == span[2] and min(span[1], other[1]) > max(span[0], other[0]):
+                    other[0], other[1] = min(span[0], other[0]), max(span[1], other[1])
+                    other[3] = max(span[3], other[3])
+                    break
+            else:
+                merged.append(span)
+
+        def conflicts(span, other):
+            if span[0] == other[0] and span[1] == other[1]:
+                return span[3] <= other[3]
+            return other[0] <= span[0] and span[1] <= other[1]
+
+        kept = []
+        for i, span in enumerate(merged):
+            if not any(conflicts(span, other) for other in merged[i + 1:] + kept):
+                kept.append(span)
+
+        joined = []
+        for span in kept:
+            if joined and joined[-1][2] == span[2] and span[0] > joined[-1][1] \
+                    and not text[joined[-1][1]:span[0]].strip(" "):
+                span = [joined.pop()[0], span[1], span[2], span[3]]
+            joined.append(span)
+
+        joined.sort(key=lambda span: (span[0], span[1]))
+        return [(start, min(end, joined[i + 1][0]) if i + 1 < len(joined) else end, label_id)
+                for i, (start, end, label_id, _) in enumerate(joined)]
+
+    def mask(self, text: str, replacement: str = MASK) -> str:
+        """Replace every span with `replacement` in one pass over the text, after `resolve`."""
+        pieces = []
+        position = 0
+        for start, end, _ in self.resolve(text):
+            pieces.append(text[position:start])
+            pieces.append(replacement)
+            position = end
+        pieces.append(text[position:])
+        return "".join(pieces)
+
+    def annotate(self, text: str) -> str:
+        """Replace every span with a <LABEL> tag, skipping spans that overlap an earlier one."""
+        pieces = []
+        position = 0
+        for start, end, label_id in self._ordered():
+            if start < position:
+                continue
+            pieces.append(text[position:start])
+            pieces.append(f"<{_labels[label_id]}>")
+            position = end
+        pieces.append(text[position:])
+        return "".join(pieces)
+
+    def to_labels(self) -> List[Dict[str, Any]]:
+        """Return the spans as {'label', 'start', 'end', 'score'} dicts, for JSON storage."""
+        return [span._asdict() for span in self]
+
+    def to_compact(self, type_ids: Dict[str, int]) -> List[List[Any]]:
+        """Return [type id, start, end, score] arrays ordered by offset, adding new labels to `type_ids`."""
+        scores = self._scores
+        ints = self._ints
+        order = sorted(range(len(scores)), key=lambda i: (ints[3 * i + 1], ints[3 * i + 2]))
+        return [[type_ids.setdefault(_labels[ints[3 * i]], len(type_ids)), ints[3 * i + 1], ints[3 * i + 2],
+                 round(scores[i], 3)] for i in order]
@@ -0,0 +1,400 @@
+from typing import List, Dict, Any, Callable, Optional
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from .snapshot import load_pipeline
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+def _write_temp(path: str, lines: List[str]) -> str:
+    """Write lines next to `path` under a temporary name and return that name."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path
+
+def _write_atomically(path: str, lines: List[str]) -> None:
+    """Write a file so readers never see partial output."""
+    os.replace(_write_temp(path, lines), path)
+
+def _read_texts(input_path: str) -> List[str]:
+    """Read one text per line, or the "text" field of each JSONL record."""
+    with open(input_path, "r", encoding="utf-8") as f:
+        if input_path.endswith(".jsonl"):
+            return [json.loads(line)["text"] for line in f if line.strip()]
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+# The attempt limit of the job a shard belongs to, for use in queries on the shards table
+JOB_MAX_ATTEMPTS = "(SELECT max_attempts FROM jobs WHERE jobs.job = shards.job)"
+
+class ShardQueue:
+    """Durable work queue of text shards kept in a spool directory.
+
+    The spool holds a SQLite database plus the shard input and result files, so
+    a spool on shared storage can serve workers on several machines. Workers
+    lease shards for a limited time and renew the lease while they work; a shard
+    whose lease expires (for instance because its worker crashed) is reclaimed
+    and becomes available again until the job's attempt limit is reached. The
+    limit is stored with each job (`max_attempts` is the default for jobs
+    submitted through this queue), so every worker applies the same one.
+    """
+
+    def __init__(self, spool_dir: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> None:
+        self.spool_dir = spool_dir
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.join(spool_dir, "shards"), exist_ok=True)
+        os.makedirs(os.path.join(spool_dir, "results"), exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(spool_dir, "queue.sqlite3"), timeout=30,
+                                          isolation_level=None)
+        self.connection.executescript(
+            f"""CREATE TABLE IF NOT EXISTS jobs (
+                job TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                shards INTEGER NOT NULL,
+                texts INTEGER NOT NULL,
+                max_attempts INTEGER NOT NULL DEFAULT {DEFAULT_MAX_ATTEMPTS}
+            );
+            CREATE TABLE IF NOT EXISTS shards (
+                id TEXT PRIMARY KEY,
+                job TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                texts INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS shards_status ON shards (status, lease_expires);"""
+        )
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(jobs)")]
+        if "max_attempts" not in columns:
+            # Spools created before the limit was stored per job
+            self.connection.execute(
+                f"ALTER TABLE jobs ADD COLUMN max_attempts INTEGER NOT NULL DEFAULT {DEFAULT_MAX_ATTEMPTS}")
+
+    def _input_path(self, shard_id: str) -> str:
+        return os.path.join(self.spool_dir, "shards", f"{shard_id}.jsonl")
+
+    def _result_path(self, shard_id: str) -> str:
+        return os.path.join(self.spool_dir, "results", f"{shard_id}.jsonl")
+
+    def submit(self, texts: List[str], shard_size: int = 500, max_attempts: Optional[int] = None) -> str:
+        """Split texts into shards, spool them and return the new job id.
+
+        Each shard is leased at most `max_attempts` times (default: the queue's `max_attempts`).
+        """
+        job = time.strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:6]
+        shards = []
+        for position, start in enumerate(range(0, len(texts), shard_size)):
+            shard_id = f"{job}_{position:05d}"
+            chunk = texts[start:start + shard_size]
+            _write_atomically(self._input_path(shard_id), [json.dumps(text) for text in chunk])
+            shards.append((shard_id, job, position, len(chunk)))
+
+        self.connection.execute("BEGIN IMMEDIATE")
+        self.connection.execute("INSERT INTO jobs VALUES (?, ?, ?, ?, ?)",
+                                (job, time.time(), len(shards), len(texts), max_attempts or self.max_attempts))
+        self.connection.executemany("INSERT INTO shards (id, job, position, texts) VALUES (?, ?, ?, ?)", shards)
+        self.connection.execute("COMMIT")
+        return job
+
+    def _reclaim(self, now: float) -> int:
+        """Release shards whose lease expired, failing those that used up their attempts (inside a transaction)."""
+        return self.connection.execute(
+            f"""UPDATE shards SET status = CASE WHEN attempts >= {JOB_MAX_ATTEMPTS} THEN 'failed' ELSE 'pending' END,
+               worker = NULL, lease_expires = NULL, error = COALESCE(error, 'lease expired')
+               WHERE status = 'leased' AND lease_expires < ?""",
+            (now,)
+        ).rowcount
+
+    def reclaim_expired(self) -> int:
+        """Release every shard whose lease expired and return how many there were.
+
+        Workers do this when leasing; the coordinator also does it while waiting,
+        so a job still finishes when no worker is left to lease.
+        """
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            reclaimed = self._reclaim(time.time())
+            self.connection.execute("COMMIT")
+            return reclaimed
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def lease(self, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[str]:
+        """Claim the next pending or expired shard for `worker`, or return None if there is none."""
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._reclaim(now)
+            row = self.connection.execute(
+                f"""SELECT id FROM shards WHERE status = 'pending' AND attempts < {JOB_MAX_ATTEMPTS}
+                   ORDER BY job, position LIMIT 1"""
+            ).fetchone()
+            if row is None:
+                self.connection.execute("COMMIT")
+                return None
+            self.connection.execute(
+                """UPDATE shards SET status = 'leased', worker = ?, lease_expires = ?,
+                   attempts = attempts + 1, started_at = ? WHERE id = ?""",
+                (worker, now + lease_seconds, now, row[0])
+            )
+            self.connection.execute("COMMIT")
+            return row[0]
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def renew(self, shard_id: str, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Extend `worker`'s lease on a shard, returning False if the lease was lost."""
+        cursor = self.connection.execute(
+            "UPDATE shards SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + lease_seconds, shard_id, worker)
+        )
+        return cursor.rowcount == 1
+
+    def leased(self) -> int:
+        """Return the number of shards currently leased, across all jobs."""
+        return self.connection.execute("SELECT COUNT(*) FROM shards WHERE status = 'leased'").fetchone()[0]
+
+    def read_shard(self, shard_id: str) -> List[str]:
+        with open(self._input_path(shard_id), "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def complete(self, shard_id: str, worker: str, results: List[str]) -> bool:
+        """Atomically publish a shard's results and mark it done, if `worker` still holds the lease."""
+        result_path = self._result_path(shard_id)
+        tmp_path = _write_temp(result_path, [json.dumps(result) for result in results])
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self.connection.execute(
+                "UPDATE shards SET status = 'done', finished_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time(), shard_id, worker)
+            )
+            if cursor.rowcount == 1:
+                # Renaming while holding the write lock keeps a late worker from overwriting newer results
+                os.replace(tmp_path, result_path)
+                self.connection.execute("COMMIT")
+                return True
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.connection.execute("ROLLBACK")
+        os.remove(tmp_path)
+        return False
+
+    def fail(self, shard_id: str, worker: str, error: str) -> None:
+        """Release a shard after an error, or give up on it once its job's attempt limit is reached."""
+        self.connection.execute(
+            f"""UPDATE shards SET status = CASE WHEN attempts >= {JOB_MAX_ATTEMPTS} THEN 'failed' ELSE 'pending' END,
+               worker = NULL, lease_expires = NULL, error = ?
+               WHERE id = ? AND worker = ? AND status = 'leased'""",
+            (error, shard_id, worker)
+        )
+
+    def report(self, job: str) -> Dict[str, Any]:
+        """Summarize a job's progress and the throughput of its completed shards."""
+        counts = dict(self.connection.execute(
+            "SELECT status, COUNT(*) FROM shards WHERE job = ? GROUP BY status", (job,)
+        ).fetchall())
+        done_texts, first_start, last_finish = self.connection.execute(
+            "SELECT COALESCE(SUM(texts), 0), MIN(started_at), MAX(finished_at) FROM shards WHERE job = ? AND status = 'done'",
+            (job,)
+        ).fetchone()
+        workers = self.connection.execute(
+            """SELECT worker, COUNT(*), SUM(texts), SUM(finished_at - started_at)
+               FROM shards WHERE job = ? AND status = 'done' GROUP BY worker""",
+            (job,)
+        ).fetchall()
+        elapsed = (last_finish - first_start) if done_texts else 0.0
+        total_shards, total_texts = self.connection.execute(
+            "SELECT shards, texts FROM jobs WHERE job = ?", (job,)
+        ).fetchone()
+        return {
+            "job": job,
+            "shards": total_shards,
+            "texts": total_texts,
+            "status": {status: counts.get(status, 0) for status in ("pending", "leased", "done", "failed")},
+            "done_texts": done_texts,
+            "elapsed_seconds": elapsed,
+            "throughput_texts_per_second": done_texts / elapsed if elapsed else 0.0,
+            "workers": [
+                {"worker": worker, "shards": shards, "texts": texts,
+                 "texts_per_second": texts / busy if busy else 0.0}
+                for worker, shards, texts, busy in workers
+            ],
+        }
+
+    def is_finished(self, job: str) -> bool:
+        report = self.report(job)
+        return report["status"]["done"] + report["status"]["failed"] == report["shards"]
+
+    def collect(self, job: str, output_path: str) -> int:
+        """Concatenate the results of a finished job in input order into one JSONL file."""
+        shard_ids = [row[0] for row in self.connection.execute(
+            "SELECT id FROM shards WHERE job = ? AND status = 'done' ORDER BY position", (job,)
+        )]
+        count = 0
+        with open(output_path, "w", encoding="utf-8") as out:
+            for shard_id in shard_ids:
+                with open(self._result_path(shard_id), "r", encoding="utf-8") as f:
+                    for line in f:
+                        out.write(line)
+                        count += 1
+        return count
+
+    def close(self) -> None:
+        self.connection.close()
+
+def _pipeline_processor() -> Callable[[List[str]], List[str]]:
+    """Build (or restore from a snapshot) the anonymization pipeline once and return a function applying it to a batch."""
+    anonymizers = load_pipeline()
+
+    def process(texts):
+        for anonymizer in anonymizers:
+            texts = anonymizer.do_anonymize(texts)
+        return texts
+
+    return process
+
+def _renew_lease(spool_dir: str, shard_id: str, worker: str, lease_seconds: float, stop: threading.Event) -> None:
+    """Renew a shard's lease every third of `lease_seconds` until `stop` is set or the lease is lost."""
+    # SQLite connections cannot be shared between threads, so the heartbeat opens its own
+    queue = ShardQueue(spool_dir)
+    try:
+        while not stop.wait(lease_seconds / 3):
+            if not queue.renew(shard_id, worker, lease_seconds):
+                return
+    finally:
+        queue.close()
+
+def run_worker(spool_dir: str, process: Callable[[List[str]], List[str]] = None,
+               lease_seconds: float = DEFAULT_LEASE_SECONDS, poll_seconds: float = 2.0,
+               exit_when_idle: bool = True, worker: str = None) -> int:
+    """Lease and process shards until the queue is empty; returns the number of shards completed.
+
+    The lease is renewed while a shard is processed, so shards that take longer
+    than `lease_seconds` are not handed to another worker. An idle worker only
+    exits once no shard is leased either, since an expired lease puts its shard
+    back in the queue.
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = ShardQueue(spool_dir)
+    # Models are loaded once per worker and stay warm across shards
+    process = process or _pipeline_processor()
+    completed = 0
+    try:
+        while True:
+            shard_id = queue.lease(worker, lease_seconds)
+            if shard_id is None:
+                if exit_when_idle and queue.leased() == 0:
+                    return completed
+                time.sleep(poll_seconds)
+                continue
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=_renew_lease, args=(spool_dir, shard_id, worker, lease_seconds, stop),
+                                         daemon=True)
+            heartbeat.start()
+            try:
+                results = process(queue.read_shard(shard_id))
+            except Exception as e:
+                print(f"[{worker}] shard {shard_id} failed: {e}")
+                queue.fail(shard_id, worker, str(e))
+                continue
+            finally:
+                stop.set()
+                heartbeat.join()
+            if queue.complete(shard_id, worker, results):
+                completed += 1
+                print(f"[{worker}] completed shard {shard_id}")
+            else:
+                print(f"[{worker}] lease on {shard_id} expired before completion")
+    finally:
+        queue.close()
+
+def print_report(report: Dict[str, Any]) -> None:
+    status = report["status"]
+    print(f"Job {report['job']}: {status['done']}/{report['shards']} shards done, "
+          f"{status['leased']} leased, {status['pending']} pending, {status['failed']} failed")
+    print(f"Throughput: {report['done_texts']} texts in {report['elapsed_seconds']:.1f}s "
+          f"({report['throughput_texts_per_second']:.1f} texts/s)")
+    for worker in report["workers"]:
+        print(f"  {worker['worker']}: {worker['shards']} shards, {worker['texts']} texts, "
+              f"{worker['texts_per_second']:.1f} texts/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coordinate or run distributed batch anonymization over a spool directory")
+    parser.add_argument('--spool', required=True,
+                        help='Spool directory shared by the coordinator and all workers')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit = commands.add_parser('submit', help='Split an input file into shards and queue them')
+    submit.add_argument('-i', '--input', required=True,
+                        help='Text file with one text per line, or JSONL with a "text" field')
+    submit.add_argument('--shard-size', type=int, default=500)
+    submit.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help='Times a shard is leased before it is marked failed; workers apply the same limit')
+    submit.add_argument('--wait', action='store_true',
+                        help='Wait for the job to finish and print the throughput report')
+    submit.add_argument('-o', '--output',
+                        help='With --wait, collect the results into this JSONL file')
+
+    worker = commands.add_parser('worker', help='Process shards until the queue is empty')
+    worker.add_argument('--processes', type=int, default=1,
+                        help='Number of worker processes to start on this machine')
+    worker.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS)
+    worker.add_argument('--follow', action='store_true',
+                        help='Keep polling for new shards instead of exiting when idle')
+
+    status = commands.add_parser('status', help='Print the progress and throughput of a job')
+    status.add_argument('job')
+
+    collect = commands.add_parser('collect', help='Concatenate the results of a job')
+    collect.add_argument('job')
+    collect.add_argument('-o', '--output', required=True)
+
+    args = parser.parse_args()
+    queue = ShardQueue(args.spool)
+
+    if args.command == 'submit':
+        job = queue.submit(_read_texts(args.input), args.shard_size, args.max_attempts)
+        print(f"Submitted job {job}")
+        if args.wait:
+            while not queue.is_finished(job):
+                # Expired leases are reclaimed here too, in case every worker is gone
+                queue.reclaim_expired()
+                time.sleep(2.0)
+            print_report(queue.report(job))
+            if args.output:
+                print(f"Collected {queue.collect(job, args.output)} results into {args.output}")
+    elif args.command == 'worker':
+        kwargs = {"lease_seconds": args.lease_seconds, "exit_when_idle": not args.follow}
+        processes = [multiprocessing.Process(target=run_worker, args=(args.spool,), kwargs=kwargs)
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    elif args.command == 'status':
+        print_report(queue.report(args.job))
+    elif args.command == 'collect':
+        print(f"Collected {queue.collect(args.job, args.output)} results into {args.output}")
+
+    queue.close()
@@ -1,5 +1,12 @@
 from sklearn.metrics import precision_score, recall_score, f1_score
+import numpy as np
 from collections import defaultdict
+from statistics import NormalDist
+import math
+
+def _span_keys(spans):
+    """Return (entity, start, end) triples from a SpanList or a list of tuples."""
+    return spans.keys() if hasattr(spans, 'keys') else set(spans)
 
 def calculate_metrics(true_entities, predicted_entities):
     # Debugging: Print the inputs for verification
@@ -20,7 +27,7 @@ def calculate_metrics(true_entities, predicted_entities):
     # Flatten lists of entity tuples and their labels
     for true_list, pred_list in zip(true_entities, predicted_entities):
         true_set = set((ent['entity'], ent['start'], ent['end']) for ent in true_list)
-        pred_set = set(pred_list)
+        pred_set = _span_keys(pred_list)
         
         # Add true and predicted labels
         for ent in true_set:
@@ -43,7 +50,7 @@ def calculate_metrics(true_entities, predicted_entities):
     entity_metrics_results = defaultdict(lambda: {'true_labels': [], 'pred_labels': []})
     for true_list, pred_list in zip(true_entities, predicted_entities):
         true_set = set((ent['entity'], ent['start'], ent['end']) for ent in true_list)
-        pred_set = set(pred_list)
+        pred_set = _span_keys(pred_list)
         
         for ent in true_set:
             entity, start, end = ent
@@ -72,3 +79,182 @@ def calculate_metrics(true_entities, predicted_entities):
         }
 
     return global_precision, global_recall, global_f1, entity_metrics_results_final
+
+
+def threshold_sweep(true_entities, predicted_entities):
+    """Compute precision, recall and F1 at every score threshold in one pass.
+
+    `true_entities` holds one list of (entity, start, end) tuples per document and
+    `predicted_entities` one SpanList (or list of (entity, start, end, score)
+    tuples) per document. Predictions
+    are sorted by score once per entity type; cumulative true/false positive counts
+    then give the metrics for every distinct threshold. Metrics are fractions in
+    [0, 1]. The 'ALL' entry pools every entity type.
+    """
+    scores_by_entity = defaultdict(list)
+    hits_by_entity = defaultdict(list)
+    n_true_by_entity = defaultdict(int)
+
+    for true_list, pred_list in zip(true_entities, predicted_entities):
+        true_set = set(true_list)
+        for entity, start, end in true_set:
+            n_true_by_entity[entity] += 1
+            n_true_by_entity['ALL'] += 1
+
+        # Keep the highest score when a span is predicted more than once
+        best_scores = {}
+        for entity, start, end, score in pred_list:
+            key = (entity, start, end)
+            best_scores[key] = max(score, best_scores.get(key, score))
+
+        for key, score in best_scores.items():
+            for label in (key[0], 'ALL'):
+                scores_by_entity[label].append(score)
+                hits_by_entity[label].append(key in true_set)
+
+    curves = {}
+    for label in sorted(set(n_true_by_entity) | set(scores_by_entity)):
+        scores = np.asarray(scores_by_entity[label], dtype=float)
+        hits = np.asarray(hits_by_entity[label], dtype=bool)
+        n_true = n_true_by_entity[label]
+
+        order = np.argsort(-scores, kind='stable')
+        scores, hits = scores[order], hits[order]
+        tp = np.cumsum(hits)
+        fp = np.cumsum(~hits)
+
+        # Predictions sharing a score are accepted together: keep the last index of each score run
+        last = np.r_[scores[1:] != scores[:-1], True] if len(scores) else np.zeros(0, dtype=bool)
+        thresholds, tp, fp = scores[last], tp[last], fp[last]
+
+        precision = np.divide(tp, tp + fp, out=np.zeros(len(tp)), where=(tp + fp) > 0)
+        recall = tp / n_true if n_true else np.zeros(len(tp))
+        f1 = np.divide(2 * precision * recall, precision + recall,
+                       out=np.zeros(len(tp)), where=(precision + recall) > 0)
+
+        best = int(np.argmax(f1)) if len(f1) else None
+        curves[label] = {
+            'support': n_true,
+            'thresholds': thresholds.tolist(),
+            'precision': precision.tolist(),
+            'recall': recall.tolist(),
+            'f1': f1.tolist(),
+            'best': None if best is None else {
+                'threshold': float(thresholds[best]),
+                'precision': float(precision[best]),
+                'recall': float(recall[best]),
+                'f1': float(f1[best])
+            }
+        }
+
+    return curves
+
+
+def span_counts(true_entities, predicted_entities):
+    """Return an array of per-document [tp, fp, fn] counts for exact (entity, start, end) matches.
+
+    Arguments are as for `threshold_sweep`: (entity, start, end) tuples and a
+    SpanList (or list of tuples) per document.
+    """
+    counts = np.zeros((len(true_entities), 3), dtype=np.int64)
+    for i, (true_list, pred_list) in enumerate(zip(true_entities, predicted_entities)):
+        true_set = set(true_list)
+        pred_set = _span_keys(pred_list)
+        tp = len(true_set & pred_set)
+        counts[i] = (tp, len(pred_set) - tp, len(true_set) - tp)
+    return counts
+
+
+def micro_f1(totals):
+    """Micro-averaged F1 from [tp, fp, fn] totals along the last axis."""
+    tp, fp, fn = totals[..., 0], totals[..., 1], totals[..., 2]
+    denominator = 2 * tp + fp + fn
+    return np.divide(2 * tp, denominator, out=np.zeros(denominator.shape), where=denominator > 0)
+
+
+def bootstrap_f1(counts, n_resamples=1000, seed=None, max_cells=10_000_000):
+    """Bootstrap the micro F1 of several systems evaluated on the same documents.
+
+    `counts` has shape (systems, documents, 3). Every resample reweights the
+    documents with Poisson(1) counts shared by all systems, so differences
+    between systems are paired. Resamples are drawn in chunks of at most
+    `max_cells` weights and reduced with one matrix product per chunk.
+    Returns an array of shape (n_resamples, systems).
+    """
+    rng = np.random.default_rng(seed)
+    n_systems, n_documents, _ = counts.shape
+    chunk = max(1, max_cells // max(n_documents, 1))
+    flat = counts.transpose(1, 0, 2).reshape(n_documents, n_systems * 3)
+
+    replicates = []
+    for start in range(0, n_resamples, chunk):
+        weights = rng.poisson(1.0, size=(min(chunk, n_resamples - start), n_documents))
+        totals = (weights @ flat).reshape(-1, n_systems, 3)
+        replicates.append(micro_f1(totals))
+    return np.concatenate(replicates)
+
+
+def alpha_spent(fraction, alpha):
+    """Error rate an O'Brien-Fleming-type spending function (Lan-DeMets) allows once `fraction` of the data is seen."""
+    if fraction <= 0:
+        return 0.0
+    normal = NormalDist()
+    return 2 * (1 - normal.cdf(normal.inv_cdf(1 - alpha / 2) / math.sqrt(min(fraction, 1.0))))
+
+
+def sequential_comparison(batches, total, alpha=0.05, min_documents=64, margin=0.0, n_resamples=2000, seed=0):
+    """Compare systems batch by batch, stopping once every difference against system 1 is resolved.
+
+    `batches` yields per-document counts of shape (systems, documents, 3) (see
+    `span_counts`) and is only consumed until the comparison stops, so whatever
+    produces a batch is skipped afterwards. `total` is the number of documents
+    available.
+
+    After each batch, each F1 difference gets a normal interval from its paired
+    bootstrap standard error. Checking after every batch would inflate the error
+    rate, so looks from `min_documents` on spend `alpha` with `alpha_spent` over
+    the fraction of documents seen, split evenly between the differences
+    (Bonferroni). A difference is resolved when its interval excludes zero or,
+    with `margin` > 0, lies within +/- margin; the chance of stopping on a
+    difference that does not exist stays below `alpha`.
+
+    Yields a dict per round and ends when it stops or the batches run out.
+    """
+    normal = NormalDist()
+    counts = None
+    spent = 0.0
+    for batch in batches:
+        counts = batch if counts is None else np.concatenate([counts, batch], axis=1)
+        n_systems, seen, _ = counts.shape
+        if n_systems < 2:
+            raise ValueError("A comparison needs at least two systems")
+
+        f1 = micro_f1(counts.sum(axis=1))
+        replicates = bootstrap_f1(counts, n_resamples=n_resamples, seed=seed + seen)
+        differences = f1[1:] - f1[0]
+        standard_errors = (replicates[:, 1:] - replicates[:, :1]).std(axis=0, ddof=1)
+
+        level = 0.0
+        if seen >= min_documents:
+            level = alpha_spent(seen / total, alpha) - spent
+            spent += level
+        # Before min_documents nothing is spent; the intervals shown then use the overall alpha
+        per_difference = (level if level > 0 else alpha) / len(differences)
+        z = -normal.inv_cdf(per_difference / 2)
+        intervals = [[difference - z * error, difference + z * error]
+                     for difference, error in zip(differences.tolist(), standard_errors.tolist())]
+        resolved = [level > 0 and (low > 0 or high < 0 or (margin > 0 and -margin < low and high < margin))
+                    for low, high in intervals]
+        stop = level > 0 and all(resolved)
+
+        yield {
+            'documents': seen,
+            'f1': f1.tolist(),
+            'f1_intervals': np.quantile(replicates, [alpha / 2, 1 - alpha / 2], axis=0).T.tolist(),
+            'difference_intervals': intervals,
+            'alpha': level,
+            'resolved': resolved,
+            'stop': stop,
+        }
+        if stop:
+            return
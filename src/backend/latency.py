@@ -0,0 +1,27 @@
+from typing import List, Dict, Any
+import statistics
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of `values` (0.0 when empty)."""
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """Summarize latencies as mean, p50, p95, p99 and max, in their own unit."""
+    return {
+        "mean": statistics.fmean(latencies) if latencies else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": max(latencies, default=0.0),
+    }
+
+def run_summary(requests: int, errors: int, elapsed: float, latencies: List[float]) -> Dict[str, Any]:
+    """Summarize a load run of `requests` requests taking `elapsed` seconds, with latencies in ms."""
+    return {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": errors / requests if requests else 0.0,
+        "throughput_rps": (requests - errors) / elapsed if elapsed else 0.0,
+        "latency_ms": latency_summary(latencies),
+    }
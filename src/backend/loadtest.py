@@ -0,0 +1,297 @@
+from typing import List, Dict, Any, Optional
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+import httpx
+import yaml
+
+try:
+    import websockets
+except ImportError:  # only needed for --stream
+    websockets = None
+
+from .server import app, get_pipeline
+from .latency import run_summary
+
+DEFAULT_RECOGNIZER_CONF = os.path.join(os.path.dirname(__file__), "conf", "recognizer.yaml")
+
+# Filler vocabulary sprinkled with names the recognizers are expected to mask
+FILLER_WORDS = ["the", "network", "uses", "my", "phone", "service", "external", "core", "provider",
+                "contract", "with", "and", "for", "billing", "roaming", "data", "plan", "support"]
+ENTITY_WORDS = ["Verizon", "AT&T", "TELUS", "Jio", "T-Mobile", "John", "Jane", "Google", "Airtel"]
+
+def load_stub_terms(conf_file: str = DEFAULT_RECOGNIZER_CONF) -> List[str]:
+    """Collect the deny-list terms of a recognizer YAML file."""
+    with open(conf_file, "r") as f:
+        recognizers = yaml.safe_load(f).get("recognizers", [])
+    return [term for recognizer in recognizers for term in recognizer.get("deny_list", [])]
+
+def make_stub_pipeline(terms: List[str]):
+    """Build a model-free stand-in for execute_pipeline that masks deny-list terms with a regex."""
+    pattern = re.compile(r"(?<!\w)(?:" + "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)) + r")(?!\w)")
+
+    def stub_pipeline(texts):
+        if isinstance(texts, list):
+            return [pattern.sub("****", text) for text in texts]
+        return pattern.sub("****", texts)
+
+    return stub_pipeline
+
+class RequestGenerator:
+    """Generate /text payloads with a configurable size distribution and duplicate ratio."""
+
+    def __init__(self, size_distribution: str = "lognormal", mean_words: int = 40,
+                 texts_per_request: int = 1, duplicate_ratio: float = 0.0, seed: int = 0) -> None:
+        self.size_distribution = size_distribution
+        self.mean_words = mean_words
+        self.texts_per_request = texts_per_request
+        self.duplicate_ratio = duplicate_ratio
+        self.random = random.Random(seed)
+        self.sent = []
+
+    def _word_count(self) -> int:
+        if self.size_distribution == "fixed":
+            return self.mean_words
+        if self.size_distribution == "uniform":
+            return self.random.randint(1, 2 * self.mean_words)
+        if self.size_distribution == "lognormal":
+            # sigma=1 gives a long tail; mu is chosen so the mean equals mean_words
+            return max(1, round(self.random.lognormvariate(math.log(self.mean_words) - 0.5, 1.0)))
+        raise ValueError(f"Unknown size distribution: {self.size_distribution}")
+
+    def _text(self) -> str:
+        words = [self.random.choice(ENTITY_WORDS) if self.random.random() < 0.1 else self.random.choice(FILLER_WORDS)
+                 for _ in range(self._word_count())]
+        return " ".join(words)
+
+    def next_payload(self) -> Dict[str, Any]:
+        if self.sent and self.random.random() < self.duplicate_ratio:
+            return self.random.choice(self.sent)
+        payload = {"text": [self._text() for _ in range(self.texts_per_request)]}
+        self.sent.append(payload)
+        return payload
+
+async def run_level(client: httpx.AsyncClient, generator: RequestGenerator,
+                    concurrency: int, requests: int) -> Dict[str, Any]:
+    """Send `requests` POSTs to /text with `concurrency` concurrent workers."""
+    payloads = [generator.next_payload() for _ in range(requests)]
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal errors, next_index
+        while next_index < len(payloads):
+            payload = payloads[next_index]
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                response = await client.post("/text", json=payload)
+                failed = response.status_code != 200
+            except httpx.HTTPError:
+                failed = True
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {"concurrency": concurrency, **run_summary(requests, errors, elapsed, latencies)}
+
+def find_knee(levels: List[Dict[str, Any]], min_gain: float = 0.1) -> Optional[Dict[str, Any]]:
+    """Return the last level before adding concurrency stops raising throughput by at least `min_gain`."""
+    for current, following in zip(levels, levels[1:]):
+        if following["throughput_rps"] < current["throughput_rps"] * (1 + min_gain):
+            return current
+    return levels[-1] if levels else None
+
+async def run_load_test(base_url: Optional[str], concurrency_levels: List[int], requests_per_level: int,
+                        generator: RequestGenerator, timeout: float = 60.0) -> List[Dict[str, Any]]:
+    """Drive /text through each concurrency level, in-process when `base_url` is None."""
+    if base_url is None:
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout)
+    else:
+        client = httpx.AsyncClient(base_url=base_url, timeout=timeout)
+
+    levels = []
+    async with client:
+        # Warm up models before measuring
+        await client.post("/text", json=generator.next_payload())
+        for concurrency in concurrency_levels:
+            level = await run_level(client, generator, concurrency, requests_per_level)
+            print(f"concurrency={concurrency:<4} throughput={level['throughput_rps']:8.1f} rps  "
+                  f"p50={level['latency_ms']['p50']:8.1f} ms  p95={level['latency_ms']['p95']:8.1f} ms  "
+                  f"errors={level['error_rate']:.1%}")
+            levels.append(level)
+    return levels
+
+async def _stream_connection(url: str, payloads: List[Dict[str, Any]], latencies: List[float]) -> int:
+    """Send payloads as frames over one WebSocket, keeping the announced window full; return the error count."""
+    async with websockets.connect(url, max_size=None) as connection:
+        window = json.loads(await connection.recv())["window"]
+        credits = asyncio.Semaphore(window)
+        sent_at = {}
+
+        async def sender():
+            for frame_id, payload in enumerate(payloads):
+                await credits.acquire()
+                sent_at[frame_id] = time.perf_counter()
+                await connection.send(json.dumps({"id": frame_id, "text": payload["text"]}))
+
+        async def receiver():
+            errors = 0
+            for _ in payloads:
+                reply = json.loads(await connection.recv())
+                latencies.append((time.perf_counter() - sent_at.pop(reply["id"])) * 1000)
+                errors += "error" in reply
+                credits.release()
+            return errors
+
+        _, errors = await asyncio.gather(sender(), receiver())
+        return errors
+
+async def run_stream_level(url: str, generator: RequestGenerator, connections: int, requests: int,
+                           window: int) -> Dict[str, Any]:
+    """Send `requests` batches to /stream spread over `connections` WebSockets."""
+    payloads = [generator.next_payload() for _ in range(requests)]
+    latencies = []
+    stream_url = f"{url}/stream?window={window}"
+
+    start = time.perf_counter()
+    errors = sum(await asyncio.gather(*(_stream_connection(stream_url, payloads[i::connections], latencies)
+                                        for i in range(connections))))
+    elapsed = time.perf_counter() - start
+
+    return {"connections": connections, "window": window, **run_summary(requests, errors, elapsed, latencies)}
+
+async def run_stream_test(base_url: str, connection_levels: List[int], requests_per_level: int,
+                          generator: RequestGenerator, window: int) -> List[Dict[str, Any]]:
+    """Drive /stream through each connection count, for comparison with the /text levels."""
+    url = "ws" + base_url[len("http"):]
+    # Warm up models before measuring
+    await _stream_connection(f"{url}/stream", [generator.next_payload()], [])
+
+    levels = []
+    for connections in connection_levels:
+        level = await run_stream_level(url, generator, connections, requests_per_level, window)
+        print(f"connections={connections:<4} throughput={level['throughput_rps']:8.1f} rps  "
+              f"p50={level['latency_ms']['p50']:8.1f} ms  p95={level['latency_ms']['p95']:8.1f} ms  "
+              f"errors={level['error_rate']:.1%}")
+        levels.append(level)
+    return levels
+
+def print_comparison(levels: List[Dict[str, Any]], stream_levels: List[Dict[str, Any]]) -> None:
+    """Print /text and /stream throughput side by side, matching concurrency to connection count."""
+    print(f"{'clients':>8}{'/text rps':>12}{'/stream rps':>14}{'ratio':>8}")
+    for level, stream_level in zip(levels, stream_levels):
+        ratio = stream_level["throughput_rps"] / level["throughput_rps"] if level["throughput_rps"] else 0.0
+        print(f"{level['concurrency']:>8}{level['throughput_rps']:>12.1f}{stream_level['throughput_rps']:>14.1f}"
+              f"{ratio:>7.2f}x")
+
+def serve_in_thread(port: int):
+    """Start uvicorn on localhost in a background thread and return the server once it accepts requests."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the PII masking service /text endpoint")
+    parser.add_argument('--url',
+                        help='Base URL of a running service; defaults to calling the app in-process')
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help='Start a local uvicorn instance on PORT and test it over HTTP')
+    parser.add_argument('--stub', action='store_true',
+                        help='Replace the NER pipeline with a deny-list regex stub (in-process or --serve only)')
+    parser.add_argument('--levels', default='1,2,4,8,16,32',
+                        help='Comma-separated concurrency ramp')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Requests sent at each concurrency level')
+    parser.add_argument('--size-distribution', choices=['fixed', 'uniform', 'lognormal'], default='lognormal',
+                        help='Distribution of words per text')
+    parser.add_argument('--mean-words', type=int, default=40,
+                        help='Mean number of words per text')
+    parser.add_argument('--texts-per-request', type=int, default=1,
+                        help='Number of texts batched into each request')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0,
+                        help='Fraction of requests that repeat an earlier payload')
+    parser.add_argument('--knee-gain', type=float, default=0.1,
+                        help='Minimum relative throughput gain that still counts as scaling')
+    parser.add_argument('--stream', action='store_true',
+                        help='Also drive the /stream WebSocket endpoint, one connection per concurrency unit '
+                             '(needs --url or --serve)')
+    parser.add_argument('--window', type=int, default=8,
+                        help='Batches each /stream connection keeps in flight')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='loadtest_report.json',
+                        help='Path of the JSON report')
+    args = parser.parse_args()
+    if args.stream and not (args.url or args.serve):
+        parser.error("--stream needs a real server: pass --url or --serve")
+    if args.stream and websockets is None:
+        parser.error("--stream needs the websockets package")
+
+    if args.stub:
+        stub_pipeline = make_stub_pipeline(load_stub_terms())
+        app.dependency_overrides[get_pipeline] = lambda: stub_pipeline
+
+    server = None
+    base_url = args.url
+    if args.serve:
+        server, thread = serve_in_thread(args.serve)
+        base_url = f"http://127.0.0.1:{args.serve}"
+
+    generator = RequestGenerator(size_distribution=args.size_distribution, mean_words=args.mean_words,
+                                 texts_per_request=args.texts_per_request,
+                                 duplicate_ratio=args.duplicate_ratio, seed=args.seed)
+    concurrency_levels = [int(level) for level in args.levels.split(",")]
+    stream_levels = None
+    try:
+        levels = asyncio.run(run_load_test(base_url, concurrency_levels, args.requests, generator))
+        if args.stream:
+            stream_levels = asyncio.run(run_stream_test(base_url, concurrency_levels, args.requests, generator,
+                                                        args.window))
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join()
+
+    knee = find_knee(levels, args.knee_gain)
+    report = {
+        "target": base_url or "in-process",
+        "stub": args.stub,
+        "config": {
+            "levels": concurrency_levels,
+            "requests_per_level": args.requests,
+            "size_distribution": args.size_distribution,
+            "mean_words": args.mean_words,
+            "texts_per_request": args.texts_per_request,
+            "duplicate_ratio": args.duplicate_ratio,
+            "window": args.window if args.stream else None,
+        },
+        "levels": levels,
+        "knee": knee,
+        "stream_levels": stream_levels,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if knee:
+        print(f"Knee at concurrency {knee['concurrency']}: {knee['throughput_rps']:.1f} rps, "
+              f"p95 {knee['latency_ms']['p95']:.1f} ms")
+    if stream_levels:
+        print_comparison(levels, stream_levels)
+    print(f"Report written to {args.output}")
@@ -1,6 +1,12 @@
+import threading
+
 from .anonymizers.transformer_anonymizer import TransformerAnonymizer
 from .anonymizers.default_anonymizer import DefaultAnonymizer
 from .anonymizers.recognizer_anonymizer import RecognizerAnonymizer
+from .anonymizers.spans import SpanList
+
+_anonymizers = None
+_anonymizers_lock = threading.Lock()
 
 def _get_pipeline():
     pipeline = [
@@ -26,14 +32,42 @@ def _get_pipeline():
     
     return pipeline
 
-def execute_pipeline(text):
-    pipeline = _get_pipeline()
-    
-    for i, step in enumerate(pipeline):
-        provider = step["provider"]
-        anonymizer = provider(conf_file=step["conf"], 
-                        	  models_file=step["models"],
-                           	  entities=step["entities"])
+def build_pipeline(pipeline=None):
+    """Instantiate the providers of a pipeline once so they can be reused across requests."""
+    if pipeline is None:
+        pipeline = _get_pipeline()
+    return [step["provider"](conf_file=step["conf"], 
+                             models_file=step["models"],
+                             entities=step["entities"]) for step in pipeline]
+
+def get_anonymizers():
+    """Return the default pipeline's providers, built once per process or restored from ANONYMIZER_SNAPSHOT."""
+    global _anonymizers
+    with _anonymizers_lock:
+        if _anonymizers is None:
+            # Imported here because the snapshot module builds on this one
+            from .snapshot import load_pipeline
+            _anonymizers = load_pipeline()
+    return _anonymizers
+
+def analyze_pipeline(anonymizers, texts):
+    """Analyze the original texts with every provider and return the combined results per text."""
+    combined = [SpanList() for _ in texts]
+    for anonymizer in anonymizers:
+        for i, results in enumerate(anonymizer.analyze(texts)):
+            combined[i].extend(results)
+    return combined
+
+def mask_texts(texts, results):
+    """Replace every detected entity with **** in a single pass over each text."""
+    return [spans.mask(text) for text, spans in zip(texts, results)]
+
+def execute_pipeline(text, anonymizers=None):
+    """Anonymize text with every provider in turn, by default with the process-wide providers."""
+    if anonymizers is None:
+        anonymizers = get_anonymizers()
+
+    for i, anonymizer in enumerate(anonymizers):
         print(f"STEP {i+1}:")
         text = anonymizer.do_anonymize(text)
     return text
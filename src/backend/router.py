@@ -0,0 +1,225 @@
+from collections import deque, Counter
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional, Tuple
+import argparse
+import json
+import threading
+import time
+
+from .pipeline import _get_pipeline, build_pipeline, analyze_pipeline, get_anonymizers
+from .anonymizers.recognizer_anonymizer import RecognizerAnonymizer
+from .anonymizers.transformer_anonymizer import TransformerAnonymizer
+from .anonymizers.ground_truth import GroundTruthDataset
+from .latency import latency_summary
+
+# Prior latency estimates per tier as (base ms, ms per character), refined by observations
+DEFAULT_TIER_PRIORS = {
+    "light": (1.0, 0.002),
+    "standard": (15.0, 0.05),
+    "full": (80.0, 0.5),
+}
+
+# Ground truth files use spaCy-style labels, the providers emit Presidio entities
+ENTITY_ALIASES = {"ORG": "ORGANIZATION", "PER": "PERSON"}
+
+def _get_tiers(pipeline):
+    """Return the provider tiers from lightest to heaviest as (name, pipeline steps)."""
+    return [
+        ("light", [step for step in pipeline if step["provider"] is RecognizerAnonymizer]),
+        ("standard", [step for step in pipeline if step["provider"] is not TransformerAnonymizer]),
+        ("full", pipeline),
+    ]
+
+@dataclass
+class RoutingRecord:
+    tier: str
+    text_length: int
+    queue_depth: int
+    latency_budget_ms: Optional[float]
+    estimated_ms: float
+    observed_ms: float
+    overloaded: bool
+
+class LatencyEstimate:
+    """Linear latency model per tier, rescaled by an EWMA of observed/predicted ratios."""
+
+    def __init__(self, base_ms: float, per_char_ms: float, alpha: float = 0.2) -> None:
+        self.base_ms = base_ms
+        self.per_char_ms = per_char_ms
+        self.alpha = alpha
+        self.scale = 1.0
+
+    def _raw(self, text_length: int) -> float:
+        return self.base_ms + self.per_char_ms * text_length
+
+    def predict(self, text_length: int) -> float:
+        return self.scale * self._raw(text_length)
+
+    def observe(self, text_length: int, observed_ms: float) -> None:
+        ratio = observed_ms / self._raw(text_length)
+        self.scale = (1 - self.alpha) * self.scale + self.alpha * ratio
+
+class ModelRouter:
+    """Pick a provider tier per request from text length, queue depth and latency budget.
+
+    The heaviest tier whose predicted latency (including the requests queued ahead)
+    fits the budget is used. Without a budget the heaviest tier is used, and once
+    the queue reaches `max_queue_depth` every request falls back to the lightest tier.
+    """
+
+    def __init__(self, tiers=None, priors: Dict[str, Tuple[float, float]] = None,
+                 max_queue_depth: int = 8, history_size: int = 1000) -> None:
+        # The default tiers reuse the process-wide providers, restored from the snapshot when configured
+        self._default_pipeline = _get_pipeline() if tiers is None else None
+        self.tiers = tiers if tiers is not None else _get_tiers(self._default_pipeline)
+        priors = priors or DEFAULT_TIER_PRIORS
+        self.estimates = {name: LatencyEstimate(*priors[name]) for name, _ in self.tiers}
+        self.max_queue_depth = max_queue_depth
+        self.history = deque(maxlen=history_size)
+        self.served = Counter()
+        self._instances = {}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def _get_anonymizers(self, tier_name: str):
+        """Instantiate a tier's providers once, sharing instances between tiers that use the same step."""
+        steps = dict(self.tiers)[tier_name]
+        with self._build_lock:
+            if self._default_pipeline is not None and not self._instances:
+                self._instances = {id(step): anonymizer
+                                   for step, anonymizer in zip(self._default_pipeline, get_anonymizers())}
+            for step in steps:
+                if id(step) not in self._instances:
+                    self._instances[id(step)] = build_pipeline([step])[0]
+            return [self._instances[id(step)] for step in steps]
+
+    def choose(self, text_length: int, queue_depth: int,
+               latency_budget_ms: Optional[float] = None) -> Tuple[str, float, bool]:
+        """Return (tier name, estimated latency in ms, overloaded flag) for a request."""
+        lightest = self.tiers[0][0]
+        if queue_depth >= self.max_queue_depth:
+            return lightest, self.estimates[lightest].predict(text_length) * (queue_depth + 1), True
+
+        for name, _ in reversed(self.tiers):
+            # Requests already queued are assumed to cost about as much as this one
+            estimated_ms = self.estimates[name].predict(text_length) * (queue_depth + 1)
+            if latency_budget_ms is None or estimated_ms <= latency_budget_ms:
+                return name, estimated_ms, False
+
+        return lightest, self.estimates[lightest].predict(text_length) * (queue_depth + 1), False
+
+    def admit(self) -> int:
+        """Count a request as in flight and return the number of requests admitted ahead of it.
+
+        Callers that hand the work to a thread pool admit the request as soon as it
+        arrives, so requests waiting for a thread count towards the queue depth.
+        """
+        with self._lock:
+            queue_depth = self._in_flight
+            self._in_flight += 1
+        return queue_depth
+
+    def release(self) -> None:
+        """Stop counting an admitted request as in flight."""
+        with self._lock:
+            self._in_flight -= 1
+
+    def route(self, texts, latency_budget_ms: Optional[float] = None, queue_depth: Optional[int] = None):
+        """Anonymize texts with the tier chosen for this request and record the decision.
+
+        `queue_depth` is the value returned by `admit` when the caller already
+        admitted the request; otherwise it is admitted here. Either way the request
+        stops counting as in flight when this returns.
+        """
+        text_length = sum(len(text) for text in texts) if isinstance(texts, list) else len(texts)
+        if queue_depth is None:
+            queue_depth = self.admit()
+
+        try:
+            tier, estimated_ms, overloaded = self.choose(text_length, queue_depth, latency_budget_ms)
+            start = time.perf_counter()
+            for anonymizer in self._get_anonymizers(tier):
+                texts = anonymizer.do_anonymize(texts)
+            observed_ms = (time.perf_counter() - start) * 1000
+        finally:
+            self.release()
+
+        self.estimates[tier].observe(text_length, observed_ms)
+        record = RoutingRecord(tier=tier, text_length=text_length, queue_depth=queue_depth,
+                               latency_budget_ms=latency_budget_ms, estimated_ms=estimated_ms,
+                               observed_ms=observed_ms, overloaded=overloaded)
+        self.history.append(record)
+        self.served[tier] += 1
+        return texts, record
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many requests each tier served and its current latency scale."""
+        return {
+            "served": dict(self.served),
+            "in_flight": self._in_flight,
+            "latency_scale": {name: estimate.scale for name, estimate in self.estimates.items()},
+            "recent": [asdict(record) for record in list(self.history)[-20:]],
+        }
+
+def _normalize_entity(label: str) -> str:
+    return ENTITY_ALIASES.get(label, label)
+
+def evaluate_tiers(ground_truth_path: str, router: ModelRouter = None) -> Dict[str, Dict[str, float]]:
+    """Measure span-level accuracy and per-document latency of every tier on a ground truth set."""
+    router = router or ModelRouter()
+    report = {}
+    for name, _ in router.tiers:
+        anonymizers = router._get_anonymizers(name)
+        tp = fp = fn = 0
+        latencies = []
+        with GroundTruthDataset(ground_truth_path) as dataset:
+            for record in dataset:
+                start = time.perf_counter()
+                results = analyze_pipeline(anonymizers, [record["text"]])[0]
+                latencies.append((time.perf_counter() - start) * 1000)
+
+                predicted = {(_normalize_entity(label), start, end) for label, start, end in results.keys()}
+                expected = {(_normalize_entity(annotation.get("label", annotation.get("entity"))),
+                             annotation["start"], annotation["end"])
+                            for annotation in record.get("annotations", [])}
+                tp += len(predicted & expected)
+                fp += len(predicted - expected)
+                fn += len(expected - predicted)
+
+        latency = latency_summary(latencies)
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        report[name] = {
+            "precision": precision,
+            "recall": recall,
+            "f1_score": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "mean_latency_ms": latency["mean"],
+            "p95_latency_ms": latency["p95"],
+            "documents": len(latencies),
+        }
+    return report
+
+def print_tradeoff(report: Dict[str, Dict[str, float]]) -> None:
+    """Print the accuracy/latency trade-off of each tier as a text chart."""
+    slowest = max((metrics["mean_latency_ms"] for metrics in report.values()), default=0.0) or 1.0
+    print(f"{'Tier':<10} {'F1':>6} {'Mean ms':>9} {'p95 ms':>9}  Latency")
+    for name, metrics in report.items():
+        bar = "#" * max(1, round(30 * metrics["mean_latency_ms"] / slowest))
+        print(f"{name:<10} {metrics['f1_score']:>6.3f} {metrics['mean_latency_ms']:>9.2f} "
+              f"{metrics['p95_latency_ms']:>9.2f}  {bar}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chart the accuracy/latency trade-off of each provider tier")
+    parser.add_argument('-g', '--ground-truth',
+                        default='CROSSCOMP/conf/ground_truth.jsonl',
+                        help='JSONL ground truth file')
+    parser.add_argument('-o', '--output',
+                        help='Write the trade-off report as JSON to this path')
+    args = parser.parse_args()
+
+    report = evaluate_tiers(args.ground_truth)
+    print_tradeoff(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,45 @@
+from typing import List, Dict, Any, Optional, Tuple
+from fastapi import Response
+import msgpack
+import orjson
+
+from .anonymizers.spans import SpanList
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+def compact_spans(results: List[SpanList]) -> Tuple[List[str], List[List[List[Any]]]]:
+    """Encode span lists as a shared type table and [type id, start, end, score] arrays per text."""
+    type_ids = {}
+    spans = [text_spans.to_compact(type_ids) for text_spans in results]
+    return list(type_ids), spans
+
+class OrjsonResponse(Response):
+    """JSON response rendered with orjson, used in place of FastAPI's deprecated ORJSONResponse."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+def negotiate_response(content: Dict[str, Any], accept: Optional[str]) -> Response:
+    """Serialize with msgpack when the client accepts it, otherwise with orjson."""
+    if accept and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES):
+        return MsgpackResponse(content)
+    return OrjsonResponse(content)
+
+def decode_frame(message: Dict[str, Any]) -> Tuple[Any, bool]:
+    """Decode a WebSocket message: msgpack in binary frames, JSON in text frames. Returns (payload, binary)."""
+    if message.get("bytes") is not None:
+        return msgpack.unpackb(message["bytes"], raw=False), True
+    return orjson.loads(message["text"]), False
+
+def encode_frame(content: Any, binary: bool) -> Dict[str, Any]:
+    """Encode a reply as an ASGI WebSocket send message in the same format as the request frame."""
+    if binary:
+        return {"type": "websocket.send", "bytes": msgpack.packb(content, use_bin_type=True)}
+    return {"type": "websocket.send", "text": orjson.dumps(content).decode("utf-8")}
@@ -1,13 +1,34 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Header, HTTPException, WebSocket
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.middleware.gzip import GZipMiddleware
+from collections import OrderedDict
+from typing import List, Optional
+import asyncio
+import threading
+import os
 
-from .pipeline import execute_pipeline
+from .pipeline import execute_pipeline, analyze_pipeline, mask_texts, get_anonymizers
+from .serialization import OrjsonResponse, compact_spans, negotiate_response, decode_frame, encode_frame
+from .router import ModelRouter
+from .anonymizers.model_pool import get_model_pool
+from .anonymizers.incremental import IncrementalAnalyzer
+from .anonymizers.registry import describe_registries
+
+@asynccontextmanager
+async def lifespan(app):
+    """Restore the providers at startup when ANONYMIZER_SNAPSHOT points to a snapshot."""
+    if os.environ.get("ANONYMIZER_SNAPSHOT"):
+        await run_in_threadpool(get_anonymizers)
+    yield
 
 app = FastAPI(
     title="PII masking service",
-    version="0.0.1"
+    version="0.0.1",
+    default_response_class=OrjsonResponse,
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -18,14 +39,209 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses for clients that send Accept-Encoding: gzip
+app.add_middleware(GZipMiddleware, minimum_size=4096)
+
 class TextRequest(BaseModel):
     text: List[str]
+    # Routing by latency budget only applies to masked responses; combined with spans it is rejected
+    latency_budget_ms: Optional[float] = None
+    spans: bool = False
+
+class DocumentRequest(BaseModel):
+    text: str
+    base_version: Optional[int] = None
+
+# Batches a /stream connection may have in flight before the server stops reading from it
+STREAM_WINDOW = 8
+STREAM_MAX_WINDOW = 64
+
+# Versioned documents kept in memory; the least recently used are forgotten beyond this
+MAX_DOCUMENTS = int(os.environ.get("ANONYMIZER_MAX_DOCUMENTS", 10000))
+
+_router = None
+_incremental = None
+_incremental_lock = threading.Lock()
+_documents = OrderedDict()
+_document_locks = {}
+
+def _get_router():
+    global _router
+    if _router is None:
+        _router = ModelRouter()
+    return _router
+
+async def _run_admitted(func, *args):
+    """Run pipeline work in the threadpool, counted in the router's queue depth while it waits and runs.
+
+    Every request using the providers is admitted, not only budgeted ones, so the
+    depth the router routes on reflects the real load on the threadpool.
+    """
+    router = _get_router()
+    router.admit()
+    try:
+        return await run_in_threadpool(func, *args)
+    finally:
+        router.release()
+
+def get_pipeline():
+    """Return the pipeline callable used by /text; overridable through app.dependency_overrides."""
+    return execute_pipeline
+
+def _analyze_texts(texts):
+    return analyze_pipeline(get_anonymizers(), texts)
+
+def get_analyzer():
+    """Return the callable producing recognizer results per text for span responses."""
+    return _analyze_texts
+
+def get_incremental_analyzer(analyzer=Depends(get_analyzer)):
+    """Return the block-level analyzer shared by all versioned documents."""
+    global _incremental
+    if _incremental is None:
+        with _incremental_lock:
+            if _incremental is None:
+                _incremental = IncrementalAnalyzer(analyzer)
+    return _incremental
 
 @app.get("/")
 async def text():
     return ("hello")
 
 @app.post("/text")
-async def process_text(request: TextRequest):
-    response = execute_pipeline(request.text)
-    return {"message": response}
+async def process_text(request: TextRequest, pipeline=Depends(get_pipeline),
+                       analyzer=Depends(get_analyzer), accept: Optional[str] = Header(None)):
+    if request.spans and request.latency_budget_ms is not None:
+        raise HTTPException(status_code=422, detail="latency_budget_ms cannot be combined with spans")
+    if request.spans:
+        # Analyze the original texts once so span offsets refer to the submitted text
+        results = await _run_admitted(analyzer, request.text)
+        types, spans = compact_spans(results)
+        content = {"message": mask_texts(request.text, results), "types": types, "spans": spans}
+    elif request.latency_budget_ms is not None:
+        # Admitted on the event loop so requests still waiting for a thread count as queued
+        router = _get_router()
+        queue_depth = router.admit()
+        response, record = await run_in_threadpool(router.route, request.text, request.latency_budget_ms, queue_depth)
+        content = {"message": response, "tier": record.tier}
+    else:
+        # Providers block, so they run in the threadpool and leave the event loop to other requests and streams
+        content = {"message": await _run_admitted(pipeline, request.text)}
+    return negotiate_response(content, accept)
+
+@app.websocket("/stream")
+async def stream(websocket: WebSocket, window: int = STREAM_WINDOW, pipeline=Depends(get_pipeline)):
+    """Anonymize framed batches sent over one connection, replying to each as soon as it is done.
+
+    Frames are {"id": ..., "text": [...]} as JSON text or msgpack binary, and
+    replies {"id": ..., "message": [...]} or {"id": ..., "error": ...} use the
+    same encoding, in completion order; frames that cannot be read get a JSON
+    error reply. The first reply announces the window: once that many batches
+    are in flight or unsent, the server stops reading and producers are pushed
+    back through the socket.
+    """
+    window = max(1, min(window, STREAM_MAX_WINDOW))
+    await websocket.accept()
+    credits = asyncio.Semaphore(window)
+    send_lock = asyncio.Lock()
+    pending = set()
+
+    async def send(content, binary):
+        async with send_lock:
+            await websocket.send(encode_frame(content, binary))
+
+    async def process(frame_id, texts, binary):
+        try:
+            content = {"id": frame_id, "message": await _run_admitted(pipeline, texts)}
+        except Exception as e:
+            content = {"id": frame_id, "error": str(e)}
+        try:
+            await send(content, binary)
+        except Exception:
+            pass  # The client is gone; the receive loop ends the connection
+        finally:
+            credits.release()
+
+    await send({"window": window}, False)
+    try:
+        while True:
+            await credits.acquire()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            payload = None
+            try:
+                payload, binary = decode_frame(message)
+                frame_id, texts = payload["id"], payload["text"]
+                if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                    raise ValueError("'text' must be a list of strings")
+            except (ValueError, KeyError, TypeError) as e:
+                await send({"id": payload.get("id") if isinstance(payload, dict) else None,
+                            "error": f"Invalid frame: {e}"}, False)
+                credits.release()
+                continue
+
+            task = asyncio.create_task(process(frame_id, texts, binary))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    finally:
+        for task in pending:
+            task.cancel()
+
+@app.get("/router/stats")
+async def router_stats():
+    return _get_router().stats()
+
+@app.get("/models/pool")
+async def model_pool():
+    return get_model_pool().stats()
+
+@app.get("/recognizers")
+async def recognizers():
+    return describe_registries()
+
+@app.put("/documents/{document_id}")
+async def update_document(document_id: str, request: DocumentRequest,
+                          incremental=Depends(get_incremental_analyzer)):
+    """Store a new version of a document, re-analyzing only the paragraphs that changed.
+
+    Only the MAX_DOCUMENTS most recently used documents are kept; a forgotten
+    document starts again at version 1.
+    """
+    def check_version():
+        current = _documents.get(document_id)
+        current_version = current["version"] if current else 0
+        if request.base_version is not None and request.base_version != current_version:
+            raise HTTPException(status_code=409, detail=f"Document is at version {current_version}")
+        return current_version
+
+    # Fail fast before analyzing, then compare-and-set once the analysis is done
+    check_version()
+    results, stats = await _run_admitted(incremental.analyze, request.text)
+
+    lock = _document_locks.setdefault(document_id, asyncio.Lock())
+    async with lock:
+        if document_id not in _documents:
+            _document_locks.pop(document_id, None)
+        current_version = check_version()
+        document = {
+            "id": document_id,
+            "version": current_version + 1,
+            "message": mask_texts([request.text], [results])[0],
+            **stats
+        }
+        _documents[document_id] = document
+        _documents.move_to_end(document_id)
+        _document_locks[document_id] = lock
+        while len(_documents) > MAX_DOCUMENTS:
+            forgotten, _ = _documents.popitem(last=False)
+            _document_locks.pop(forgotten, None)
+    return document
+
+@app.get("/documents/{document_id}")
+async def get_document(document_id: str):
+    if document_id not in _documents:
+        raise HTTPException(status_code=404, detail="Unknown document")
+    _documents.move_to_end(document_id)
+    return _documents[document_id]
\ No newline at end of file
@@ -0,0 +1,158 @@
+from typing import List, Dict, Any, Optional
+from importlib import metadata
+import argparse
+import hashlib
+import os
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from .pipeline import _get_pipeline, build_pipeline
+
+SNAPSHOT_FORMAT = 1
+DEFAULT_SNAPSHOT_PATH = os.environ.get("ANONYMIZER_SNAPSHOT", "pipeline.snapshot")
+LIBRARIES = ("presidio-analyzer", "presidio-anonymizer", "spacy")
+
+def _library_versions() -> Dict[str, str]:
+    versions = {"python": platform.python_version()}
+    for library in LIBRARIES:
+        try:
+            versions[library] = metadata.version(library)
+        except metadata.PackageNotFoundError:
+            versions[library] = None
+    return versions
+
+def _file_digest(path: Optional[str]) -> Optional[str]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _step_key(step: Dict[str, Any]) -> Dict[str, Any]:
+    """Describe a pipeline step by everything its built state depends on."""
+    provider = step["provider"]
+    return {
+        "provider": f"{provider.__module__}.{provider.__qualname__}",
+        "conf": step["conf"],
+        "conf_sha256": _file_digest(step["conf"]),
+        "models": step["models"],
+        "models_sha256": _file_digest(step["models"]),
+        "entities": list(step["entities"]),
+    }
+
+def create_snapshot(path: str = DEFAULT_SNAPSHOT_PATH, pipeline=None) -> Dict[str, Any]:
+    """Build every step of the pipeline and write its reconstructable state to `path`.
+
+    The artifact records the snapshot format, library versions and a digest of
+    each step's configuration so that a stale snapshot is rejected at load time.
+    Providers without snapshot support are stored as None and rebuilt on load.
+    """
+    if pipeline is None:
+        pipeline = _get_pipeline()
+    anonymizers = build_pipeline(pipeline)
+    snapshot = {
+        "format": SNAPSHOT_FORMAT,
+        "created_at": time.time(),
+        "versions": _library_versions(),
+        "steps": [{"key": _step_key(step), "state": anonymizer.snapshot_state()}
+                  for step, anonymizer in zip(pipeline, anonymizers)],
+    }
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return snapshot
+
+def load_snapshot(path: str = DEFAULT_SNAPSHOT_PATH, pipeline=None) -> list:
+    """Instantiate the pipeline's providers and restore their state from a snapshot.
+
+    Raises RuntimeError when the snapshot was written by another format, other
+    library versions or a different pipeline configuration.
+    """
+    if pipeline is None:
+        pipeline = _get_pipeline()
+    with open(path, "rb") as f:
+        snapshot = pickle.load(f)
+
+    if snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise RuntimeError(f"Snapshot format {snapshot.get('format')} is not supported (expected {SNAPSHOT_FORMAT})")
+    if snapshot["versions"] != _library_versions():
+        raise RuntimeError(f"Snapshot was built with {snapshot['versions']}, running {_library_versions()}")
+    if [step["key"] for step in snapshot["steps"]] != [_step_key(step) for step in pipeline]:
+        raise RuntimeError("Snapshot does not match the configured pipeline")
+
+    anonymizers = build_pipeline(pipeline)
+    for anonymizer, step in zip(anonymizers, snapshot["steps"]):
+        if step["state"] is not None:
+            anonymizer.restore_state(step["state"])
+    return anonymizers
+
+def load_pipeline(path: Optional[str] = None, pipeline=None) -> list:
+    """Return the pipeline's providers, restored from a snapshot when one is configured and valid."""
+    path = path or os.environ.get("ANONYMIZER_SNAPSHOT")
+    if path and os.path.exists(path):
+        try:
+            return load_snapshot(path, pipeline)
+        # A truncated or incompatible file can fail in many ways while unpickling
+        except (RuntimeError, OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError,
+                TypeError, ValueError, KeyError) as e:
+            print(f"Ignoring snapshot {path}: {e}")
+    return build_pipeline(pipeline)
+
+COLD_START_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from src.backend.snapshot import load_snapshot
+from src.backend.pipeline import build_pipeline, analyze_pipeline
+anonymizers = load_snapshot(sys.argv[1]) if len(sys.argv) > 1 else build_pipeline()
+analyze_pipeline(anonymizers, ["John Doe uses Verizon"])
+print(time.perf_counter() - start)
+"""
+
+def measure_cold_start(path: str = DEFAULT_SNAPSHOT_PATH, runs: int = 3) -> Dict[str, List[float]]:
+    """Time fresh interpreters from import to the first analyzed text, with and without the snapshot."""
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    timings = {"rebuild": [], "snapshot": []}
+    for _ in range(runs):
+        for mode, args in (("rebuild", []), ("snapshot", [os.path.abspath(path)])):
+            output = subprocess.run([sys.executable, "-c", COLD_START_SCRIPT, *args], env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            timings[mode].append(float(output.strip().splitlines()[-1]))
+    return timings
+
+def print_cold_start(timings: Dict[str, List[float]]) -> None:
+    print(f"{'mode':<10}{'median s':>10}{'min s':>10}{'max s':>10}")
+    for mode, values in timings.items():
+        print(f"{mode:<10}{statistics.median(values):>10.2f}{min(values):>10.2f}{max(values):>10.2f}")
+    rebuild, snapshot = statistics.median(timings["rebuild"]), statistics.median(timings["snapshot"])
+    if rebuild:
+        print(f"Snapshot saves {rebuild - snapshot:.2f}s ({(rebuild - snapshot) / rebuild:.0%}) per cold start")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot the built anonymization pipeline for fast startup.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = subparsers.add_parser("create", help="Build the pipeline and write the snapshot")
+    create_parser.add_argument("-o", "--output", default=DEFAULT_SNAPSHOT_PATH, help="Snapshot file to write")
+
+    measure_parser = subparsers.add_parser("measure", help="Compare cold start with and without the snapshot")
+    measure_parser.add_argument("-s", "--snapshot", default=DEFAULT_SNAPSHOT_PATH, help="Snapshot file to load")
+    measure_parser.add_argument("-r", "--runs", type=int, default=3, help="Fresh processes per mode")
+
+    args = parser.parse_args()
+    if args.command == "create":
+        start = time.perf_counter()
+        snapshot = create_snapshot(args.output)
+        restorable = sum(step["state"] is not None for step in snapshot["steps"])
+        print(f"Wrote {args.output} ({os.path.getsize(args.output) / 1024:.1f} KiB, "
+              f"{restorable}/{len(snapshot['steps'])} steps restorable) in {time.perf_counter() - start:.2f}s")
+    else:
+        print_cold_start(measure_cold_start(args.snapshot, args.runs))
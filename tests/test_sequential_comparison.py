@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/backend')))
+from evaluation import alpha_spent, sequential_comparison
+
+def _batches(rng, total, batch_size, recalls):
+    """Yield simulated [tp, fp, fn] counts of shape (systems, documents, 3), one system per recall."""
+    for start in range(0, total, batch_size):
+        size = min(batch_size, total - start)
+        true = rng.poisson(3, size)
+        counts = []
+        for recall in recalls:
+            tp = rng.binomial(true, recall)
+            counts.append(np.stack([tp, rng.poisson(0.5, size), true - tp], axis=1))
+        yield np.stack(counts)
+
+def _final_round(seed, recalls, total):
+    rng = np.random.default_rng(seed)
+    rounds = list(sequential_comparison(_batches(rng, total, 32, recalls), total, alpha=0.05,
+                                        min_documents=64, n_resamples=400, seed=seed))
+    return rounds[-1]
+
+def test_alpha_spent_reaches_alpha():
+    assert alpha_spent(0.0, 0.05) == 0.0
+    assert alpha_spent(0.1, 0.05) < alpha_spent(0.5, 0.05) < alpha_spent(1.0, 0.05)
+    assert abs(alpha_spent(1.0, 0.05) - 0.05) < 1e-12
+
+def test_false_stop_rate_stays_near_alpha():
+    """Systems with equal expected F1 are declared different in about alpha of the trials at most."""
+    trials = 200
+    false_stops = sum(_final_round(seed, (0.7, 0.7), total=384)['stop'] for seed in range(trials))
+    # 0.05 plus about two binomial standard deviations for 200 trials
+    assert false_stops / trials <= 0.08
+
+def test_real_difference_stops_early():
+    final = _final_round(0, (0.6, 0.85), total=2000)
+    assert final['stop']
+    assert final['documents'] < 2000
+    assert final['difference_intervals'][0][0] > 0
+
+def test_single_system_is_rejected():
+    rng = np.random.default_rng(0)
+    with pytest.raises(ValueError):
+        list(sequential_comparison(_batches(rng, 64, 32, (0.7,)), 64))
@@ -0,0 +1,45 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.backend.anonymizers.spans import SpanList, MASK
+
+presidio_anonymizer = pytest.importorskip("presidio_anonymizer")
+from presidio_anonymizer.entities import OperatorConfig, RecognizerResult
+
+LABELS = ["PERSON", "ORGANIZATION", "EMAIL_ADDRESS"]
+SCORES = [0.3, 0.6, 0.85, 1.0]
+
+def _random_case(rng: random.Random):
+    """Return a short text of words and spaces and random, often overlapping spans over it."""
+    length = rng.randint(1, 40)
+    text = "".join(rng.choice("ab  ") for _ in range(length))
+    spans = []
+    for _ in range(rng.randint(0, 6)):
+        start = rng.randint(0, length - 1)
+        end = rng.randint(start + 1, length)
+        spans.append((rng.choice(LABELS), start, end, rng.choice(SCORES)))
+    return text, spans
+
+def test_mask_matches_presidio_anonymizer():
+    """SpanList.mask resolves conflicts exactly as Presidio's AnonymizerEngine with a replace operator."""
+    engine = presidio_anonymizer.AnonymizerEngine()
+    operators = {"DEFAULT": OperatorConfig("replace", {"new_value": MASK})}
+    rng = random.Random(0)
+    for _ in range(20000):
+        text, spans = _random_case(rng)
+        results = [RecognizerResult(label, start, end, score) for label, start, end, score in spans]
+        expected = engine.anonymize(text=text, analyzer_results=results, operators=operators).text
+        assert SpanList(spans).mask(text) == expected, (text, spans)
+
+def test_round_trips():
+    spans = SpanList([("PERSON", 0, 4, 0.5), ("ORGANIZATION", 10, 15, 1.0)])
+    assert SpanList.from_labels(spans.to_labels()) == spans
+    assert spans.keys() == {("PERSON", 0, 4), ("ORGANIZATION", 10, 15)}
+
+    shifted = SpanList()
+    shifted.extend(spans, offset=3)
+    assert [tuple(span)[1:3] for span in shifted] == [(3, 7), (13, 18)]